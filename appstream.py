@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compact projection of Flathub appstream documents.
+Only the handful of fields the tracker reads are kept; screenshots, releases and
+translated descriptions are dropped as soon as a document is decoded.
+"""
+
+import json
+from typing import Dict, Optional
+
+
+class AppMetadata:
+    """The appstream fields used by the runtime and donation checkers."""
+    __slots__ = ('bundle_runtime', 'metadata_runtime', 'donation_url',
+                 'project_license', 'project_group', 'developer_name')
+
+    def __init__(self, bundle_runtime: Optional[str] = None, metadata_runtime: Optional[str] = None,
+                 donation_url: Optional[str] = None, project_license: Optional[str] = None,
+                 project_group: Optional[str] = None, developer_name: Optional[str] = None):
+        self.bundle_runtime = bundle_runtime
+        self.metadata_runtime = metadata_runtime
+        self.donation_url = donation_url
+        self.project_license = project_license
+        self.project_group = project_group
+        self.developer_name = developer_name
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"AppMetadata({fields})"
+
+    @property
+    def runtime(self) -> Optional[str]:
+        """Runtime ref from the bundle, falling back to the metadata section."""
+        return self.bundle_runtime or self.metadata_runtime
+
+    @classmethod
+    def from_appstream(cls, document: Dict) -> 'AppMetadata':
+        """Project a full (or already slimmed) appstream document."""
+        def section(key: str) -> Dict:
+            value = document.get(key)
+            return value if isinstance(value, dict) else {}
+
+        def text(value) -> Optional[str]:
+            return value if isinstance(value, str) else None
+
+        return cls(
+            bundle_runtime=text(section('bundle').get('runtime')),
+            metadata_runtime=text(section('metadata').get('runtime')),
+            donation_url=text(section('urls').get('donation')),
+            project_license=text(document.get('project_license')),
+            project_group=text(document.get('project_group')),
+            developer_name=text(document.get('developer_name'))
+        )
+
+    @classmethod
+    def from_json(cls, body: str) -> 'AppMetadata':
+        """Decode an appstream response body and project it."""
+        document = json.loads(body)
+        if not isinstance(document, dict):
+            raise ValueError("appstream document is not a JSON object")
+        return cls.from_appstream(document)
+
+    def to_appstream(self) -> Dict:
+        """Return the projection in appstream shape, omitting empty fields."""
+        document = {}
+        if self.bundle_runtime:
+            document['bundle'] = {'runtime': self.bundle_runtime}
+        if self.metadata_runtime:
+            document['metadata'] = {'runtime': self.metadata_runtime}
+        if self.donation_url:
+            document['urls'] = {'donation': self.donation_url}
+        for key in ('project_license', 'project_group', 'developer_name'):
+            if getattr(self, key):
+                document[key] = getattr(self, key)
+        return document
+
+
+def slim_appstream(body: str) -> str:
+    """Reduce an appstream response body to the fields in AppMetadata.
+
+    Used as the response cache transform so cached entries, and the JSON
+    decoded on warm runs, stay small regardless of document size.
+    """
+    return json.dumps(AppMetadata.from_json(body).to_appstream(), sort_keys=True)
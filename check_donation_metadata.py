@@ -7,15 +7,24 @@ import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import requests
 from github import Github
 
+from appstream import AppMetadata, slim_appstream
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+from http_client import create_session
+from snapshot import Snapshot
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent app checks
+DEFAULT_WORKERS = 8
+
 
 @dataclass
 class DonationInfo:
@@ -30,44 +39,56 @@ class DonationInfo:
 class DonationMetadataChecker:
     """Check donation metadata for flatpak packages."""
     
-    def __init__(self, github_token: str = None, repo_name: str = None):
-        """Initialize the donation checker."""
+    def __init__(self, github_token: str = None, repo_name: str = None,
+                 cache: Optional[ResponseCache] = None, workers: int = DEFAULT_WORKERS,
+                 snapshot: Optional[Snapshot] = None, repo=None):
+        """Initialize the donation checker; ``repo`` stands in for the GitHub repository when given."""
         self.flathub_base_url = "https://flathub.org/api/v2/appstream"
         self.github_token = github_token
         self.repo_name = repo_name
-        if github_token and repo_name:
+        self.workers = max(1, workers)
+        # Flathub requests in flight adapt between one and the worker count
+        self.session = create_session(pool_maxsize=self.workers, max_concurrency=self.workers)
+        if snapshot:
+            self.session = snapshot.session(self.session)
+        self.cache = cache
+        if repo is not None:
+            self.github = None
+            self.repo = repo
+        elif github_token and repo_name:
             self.github = Github(github_token)
             self.repo = self.github.get_repo(repo_name)
         else:
             self.github = None
             self.repo = None
     
-    def get_flatpak_info(self, flatpak_id: str) -> Optional[Dict]:
-        """Get flatpak information from Flathub API."""
+    def get_flatpak_info(self, flatpak_id: str) -> Optional[AppMetadata]:
+        """Get flatpak information from Flathub API, projected to the fields we use."""
         app_id = flatpak_id.replace('app/', '')
         
         try:
-            response = requests.get(f"{self.flathub_base_url}/{app_id}?locale=en", timeout=30)
+            url = f"{self.flathub_base_url}/{app_id}?locale=en"
+            if self.cache:
+                response = self.cache.get(self.session, url, timeout=30, transform=slim_appstream)
+            else:
+                response = self.session.get(url, timeout=30)
             if response.status_code == 200:
-                return response.json()
+                return AppMetadata.from_json(response.text)
             else:
                 logger.warning(f"Could not fetch info for {app_id}: HTTP {response.status_code}")
                 return None
         except requests.RequestException as e:
             logger.warning(f"Failed to fetch info for {app_id}: {e}")
             return None
+        except ValueError as e:
+            logger.warning(f"Invalid appstream data for {app_id}: {e}")
+            return None
     
-    def get_donation_url(self, flatpak_info: Dict) -> Optional[str]:
+    def get_donation_url(self, flatpak_info: AppMetadata) -> Optional[str]:
         """Extract donation URL from flatpak metadata."""
-        try:
-            if 'urls' in flatpak_info and 'donation' in flatpak_info['urls']:
-                return flatpak_info['urls']['donation']
-            return None
-        except (KeyError, TypeError) as e:
-            logger.debug(f"Could not extract donation URL: {e}")
-            return None
+        return flatpak_info.donation_url
     
-    def is_gnome_or_kde_app(self, flatpak_id: str, flatpak_info: Dict) -> bool:
+    def is_gnome_or_kde_app(self, flatpak_id: str, flatpak_info: AppMetadata) -> bool:
         """Check if the app is a GNOME or KDE application.
         
         GNOME and KDE have their own donation infrastructure, so we skip them.
@@ -79,44 +100,36 @@ class DonationMetadataChecker:
             return True
         
         # Check by project group in metadata
-        try:
-            if 'project_group' in flatpak_info:
-                project_group = flatpak_info['project_group'].lower()
-                if project_group in ['gnome', 'kde']:
-                    return True
-        except (KeyError, TypeError, AttributeError):
-            pass
+        if flatpak_info.project_group and flatpak_info.project_group.lower() in ['gnome', 'kde']:
+            return True
         
         return False
     
-    def is_commercial_or_closed_license(self, flatpak_info: Dict) -> bool:
+    def is_commercial_or_closed_license(self, flatpak_info: AppMetadata) -> bool:
         """Check if the app is commercial or has a closed/proprietary license.
         
         Commercial apps with closed licenses should not be tracked for donation links.
         """
-        try:
-            if 'project_license' in flatpak_info:
-                license_str = flatpak_info['project_license'].lower()
-                
-                # Check for proprietary or closed license keywords
-                proprietary_keywords = [
-                    'proprietary',
-                    'commercial',
-                    'closed',
-                    'all rights reserved',
-                    'copyright only',
-                    'licenseref-proprietary'
-                ]
-                
-                for keyword in proprietary_keywords:
-                    if keyword in license_str:
-                        return True
-        except (KeyError, TypeError, AttributeError):
-            pass
+        if flatpak_info.project_license:
+            license_str = flatpak_info.project_license.lower()
+            
+            # Check for proprietary or closed license keywords
+            proprietary_keywords = [
+                'proprietary',
+                'commercial',
+                'closed',
+                'all rights reserved',
+                'copyright only',
+                'licenseref-proprietary'
+            ]
+            
+            for keyword in proprietary_keywords:
+                if keyword in license_str:
+                    return True
         
         return False
     
-    def should_skip_app(self, flatpak_id: str, flatpak_info: Dict) -> Tuple[bool, Optional[str]]:
+    def should_skip_app(self, flatpak_id: str, flatpak_info: AppMetadata) -> Tuple[bool, Optional[str]]:
         """Determine if an app should be skipped for donation checking.
         
         Returns:
@@ -135,7 +148,7 @@ class DonationMetadataChecker:
     def check_url_reachable(self, url: str) -> Tuple[bool, Optional[str]]:
         """Check if a URL is reachable."""
         try:
-            response = requests.head(url, timeout=10, allow_redirects=True)
+            response = self.session.head(url, timeout=10, allow_redirects=True)
             if response.status_code < 400:
                 return True, None
             else:
@@ -143,58 +156,61 @@ class DonationMetadataChecker:
         except requests.RequestException as e:
             return False, str(e)
     
+    def check_flatpak(self, flatpak_id: str, flatpak_info_obj) -> Optional[DonationInfo]:
+        """Check one flatpak, returning its DonationInfo if the donation link is missing or unreachable."""
+        logger.info(f"Checking {flatpak_id}...")
+        
+        # Get flatpak metadata from Flathub API
+        flatpak_info = self.get_flatpak_info(flatpak_id)
+        if not flatpak_info:
+            logger.warning(f"Could not fetch metadata for {flatpak_id}, skipping")
+            return None
+        
+        # Check if this app should be skipped (GNOME/KDE or commercial)
+        should_skip, skip_reason = self.should_skip_app(flatpak_id, flatpak_info)
+        if should_skip:
+            logger.info(f"  ⏭️  Skipping {flatpak_id}: {skip_reason}")
+            return None
+        
+        # Check for donation URL
+        donation_url = self.get_donation_url(flatpak_info)
+        
+        if not donation_url:
+            # No donation URL found
+            logger.info(f"  ❌ No donation URL for {flatpak_id}")
+            return DonationInfo(
+                flatpak_id=flatpak_id,
+                sources=flatpak_info_obj.sources,
+                donation_url=None,
+                url_reachable=None,
+                error_message="No donation URL found in metadata"
+            )
+        
+        # Check if donation URL is reachable
+        is_reachable, error_msg = self.check_url_reachable(donation_url)
+        
+        if not is_reachable:
+            # Donation URL exists but is unreachable
+            logger.info(f"  ⚠️  Unreachable donation URL for {flatpak_id}: {donation_url} ({error_msg})")
+            return DonationInfo(
+                flatpak_id=flatpak_id,
+                sources=flatpak_info_obj.sources,
+                donation_url=donation_url,
+                url_reachable=False,
+                error_message=error_msg
+            )
+        
+        logger.info(f"  ✅ Donation URL OK for {flatpak_id}: {donation_url}")
+        return None
+    
     def check_donation_metadata(self, flatpaks: Dict[str, any]) -> List[DonationInfo]:
         """Check donation metadata for all flatpaks."""
-        missing_or_unreachable = []
+        logger.info(f"Checking donation metadata for {len(flatpaks)} flatpaks with up to {self.workers} workers...")
         
-        logger.info(f"Checking donation metadata for {len(flatpaks)} flatpaks...")
-        
-        for flatpak_id, flatpak_info_obj in flatpaks.items():
-            logger.info(f"Checking {flatpak_id}...")
-            
-            # Get flatpak metadata from Flathub API
-            flatpak_info = self.get_flatpak_info(flatpak_id)
-            if not flatpak_info:
-                logger.warning(f"Could not fetch metadata for {flatpak_id}, skipping")
-                continue
-            
-            # Check if this app should be skipped (GNOME/KDE or commercial)
-            should_skip, skip_reason = self.should_skip_app(flatpak_id, flatpak_info)
-            if should_skip:
-                logger.info(f"  ⏭️  Skipping {flatpak_id}: {skip_reason}")
-                continue
-            
-            # Check for donation URL
-            donation_url = self.get_donation_url(flatpak_info)
-            
-            if not donation_url:
-                # No donation URL found
-                donation_info = DonationInfo(
-                    flatpak_id=flatpak_id,
-                    sources=flatpak_info_obj.sources,
-                    donation_url=None,
-                    url_reachable=None,
-                    error_message="No donation URL found in metadata"
-                )
-                missing_or_unreachable.append(donation_info)
-                logger.info(f"  ❌ No donation URL for {flatpak_id}")
-            else:
-                # Check if donation URL is reachable
-                is_reachable, error_msg = self.check_url_reachable(donation_url)
-                
-                if not is_reachable:
-                    # Donation URL exists but is unreachable
-                    donation_info = DonationInfo(
-                        flatpak_id=flatpak_id,
-                        sources=flatpak_info_obj.sources,
-                        donation_url=donation_url,
-                        url_reachable=False,
-                        error_message=error_msg
-                    )
-                    missing_or_unreachable.append(donation_info)
-                    logger.info(f"  ⚠️  Unreachable donation URL for {flatpak_id}: {donation_url} ({error_msg})")
-                else:
-                    logger.info(f"  ✅ Donation URL OK for {flatpak_id}: {donation_url}")
+        # Results come back in input order, so issues are created in the same order as before
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(lambda item: self.check_flatpak(*item), flatpaks.items())
+            missing_or_unreachable = [donation_info for donation_info in results if donation_info]
         
         logger.info(f"Found {len(missing_or_unreachable)} packages with missing or unreachable donation URLs")
         return missing_or_unreachable
@@ -422,6 +438,20 @@ def main():
                        help='Input JSON file with flatpak list (default: outdated_packages.json)')
     parser.add_argument('--create-issues', action='store_true',
                        help='Create GitHub issues for missing/unreachable donation links')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                       help=f'Maximum concurrent checks; Flathub requests adapt below this (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help=f'Directory for the persistent HTTP response cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_TTL,
+                       help=f'Seconds before cached responses are revalidated (default: {DEFAULT_TTL})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Disable the HTTP response cache')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--offline', metavar='DIR',
+                                help='Read every input from the snapshot in DIR and make no network calls; '
+                                     'issue changes are only logged (implies --no-cache)')
+    snapshot_group.add_argument('--record-snapshot', metavar='DIR',
+                                help='Record every input of this run into DIR for --offline (implies --no-cache)')
     args = parser.parse_args()
     
     # Load flatpaks from the input file
@@ -434,13 +464,26 @@ def main():
     github_token = os.environ.get('GITHUB_TOKEN')
     repo_name = os.environ.get('GITHUB_REPOSITORY')
     
-    if args.create_issues:
+    snapshot = None
+    if args.offline or args.record_snapshot:
+        snapshot = Snapshot(args.offline or args.record_snapshot, record=bool(args.record_snapshot))
+        args.no_cache = True
+    
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, namespace='flathub', ttl=args.cache_ttl)
+    
+    if args.create_issues and args.offline:
+        checker = DonationMetadataChecker(cache=cache, workers=args.workers, snapshot=snapshot,
+                                          repo=snapshot.repository())
+    elif args.create_issues:
         if not github_token or not repo_name:
             logger.error("GITHUB_TOKEN and GITHUB_REPOSITORY environment variables are required for creating issues")
             return 1
-        checker = DonationMetadataChecker(github_token, repo_name)
+        checker = DonationMetadataChecker(github_token, repo_name, cache=cache, workers=args.workers,
+                                          snapshot=snapshot)
+        if snapshot:
+            snapshot.record_repository(checker.repo)
     else:
-        checker = DonationMetadataChecker()
+        checker = DonationMetadataChecker(cache=cache, workers=args.workers, snapshot=snapshot)
     
     # Check donation metadata
     missing_or_unreachable = checker.check_donation_metadata(flatpaks)
@@ -492,6 +535,12 @@ def main():
         print("="*60)
         checker.close_filtered_issues(flatpaks)
     
+    if cache:
+        cache.log_summary()
+    checker.session.log_summary()
+    if snapshot:
+        snapshot.log_summary()
+    
     return 0
 
 
@@ -4,136 +4,477 @@ Check flatpak runtime updates for packages from ublue-os/bluefin system-flatpaks
 and create GitHub issues for outdated packages.
 """
 
+import collections
+import contextlib
+import functools
+import hashlib
+import math
 import os
 import re
 import subprocess
 import sys
 import json
 import logging
-from typing import Dict, List, Set, Optional, Tuple, NamedTuple
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed, wait
+from typing import Callable, Dict, List, Set, Optional, Tuple, NamedTuple
+from dataclasses import dataclass, field
+from datetime import datetime
 import requests
 import yaml
 
+from appstream import AppMetadata
+from download_stats import DownloadStats
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR, DEFAULT_TTL
+from http_client import create_session
+from remotes import BUILTIN_REMOTES, DEFAULT_REMOTE, RemoteBackend, load_remotes
+from snapshot import Snapshot
+from watch import DEFAULT_INTERVAL, DEFAULT_LISTEN, parse_listen, run_watch
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent Flathub appstream lookups; the actual number adapts below it
+DEFAULT_WORKERS = 16
+
+# Source lists slower than this fall back to their last known good copy; retries included
+SOURCE_TIMEOUT = 15
+
+# Save the checkpoint after this many finished lookups
+CHECKPOINT_INTERVAL = 10
+
+# Checkpointed lookups older than this are repeated when resuming
+DEFAULT_RESUME_MAX_AGE = 6 * 60 * 60
+
+# Lookup timeout, and the floor it may adapt down to in --deadline runs
+LOOKUP_TIMEOUT = 30
+MIN_LOOKUP_TIMEOUT = 5
+
+# Adaptive lookup timeout as a multiple of the observed p99 latency
+ADAPTIVE_TIMEOUT_FACTOR = 4
+
+# Lookups still running past this latency percentile get a hedged duplicate
+HEDGE_PERCENTILE = 90
+
+# Latency samples needed before timeouts adapt and hedging starts
+MIN_LATENCY_SAMPLES = 20
+
+# With --budget, apps not checked for this long are always checked
+DEFAULT_MAX_CHECK_AGE = 7 * 24 * 60 * 60
+
+# With --budget, an app whose lookup failed is not retried for this long, doubling with each further failure
+FAILURE_BACKOFF = 60 * 60
+
+# Runtime changes within this window count towards an app's refresh priority
+CHANGE_WINDOW = 90 * 24 * 60 * 60
+
+# Number of runtime change times kept per app
+CHANGE_HISTORY = 10
+
+# Refresh priority weights of one recent runtime change and of each tenfold in downloads
+CHANGE_WEIGHT = 0.25
+POPULARITY_WEIGHT = 0.1
+
+# Arch of the runtime ref in Flathub appstream documents
+APPSTREAM_ARCH = 'x86_64'
+
+# Runtime branches that count as stable releases (e.g. "49", "25.08", "6.10")
+STABLE_BRANCH_PATTERN = re.compile(r'^\d+(\.\d+)*$')
+
+# All sources with their URLs and formats
+SOURCES = {
+    'bluefin': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/bluefin/main/flatpaks/system-flatpaks.list',
+        'format': 'app_prefix'  # already has app/ prefix
+    },
+    'aurora': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/aurora/main/flatpaks/system-flatpaks.list', 
+        'format': 'no_prefix'  # needs app/ prefix added
+    },
+    'bazzite-gnome': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/installer/gnome_flatpaks/flatpaks',
+        'format': 'full_ref'  # app/package/arch/branch format
+    },
+    'bazzite-kde': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/installer/kde_flatpaks/flatpaks',
+        'format': 'full_ref'  # app/package/arch/branch format
+    },
+    # Bazaar config sources
+    'bluefin-bazaar': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/bluefin/main/system_files/shared/etc/bazaar/config.yaml',
+        'format': 'bazaar_yaml'  # YAML format with appids in sections
+    },
+    'aurora-bazaar': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/aurora/main/system_files/shared/etc/bazaar/config.yaml',
+        'format': 'bazaar_yaml'  # YAML format with appids in sections
+    },
+    'bazzite-bazaar': {
+        'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/system_files/desktop/shared/usr/share/ublue-os/bazaar/config.yaml',
+        'format': 'bazaar_yaml'  # YAML format with appids in sections
+    }
+}
+
+
+def arch_path(path: Optional[str], arch: str) -> Optional[str]:
+    """Per-arch variant of a cache file path; x86_64 keeps the original name."""
+    if not path or arch == APPSTREAM_ARCH:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{arch}{ext}"
+
+
+def arch_runtime(runtime_ref: str, arch: str) -> str:
+    """Swap the arch component of a name/arch/branch runtime ref."""
+    parts = runtime_ref.split('/')
+    if len(parts) == 3:
+        parts[1] = arch
+    return '/'.join(parts)
+
+
+def state_key(flatpak_id: str, arch: str) -> str:
+    """Key of an (app, arch) pair in the check state; x86_64 keeps the bare app ID."""
+    return flatpak_id if arch == APPSTREAM_ARCH else f"{flatpak_id}@{arch}"
+
 
 @dataclass
 class FlatpakInfo:
     """Information about a flatpak package from multiple sources."""
     flatpak_id: str
     sources: List[str]  # ['bluefin', 'bazzite-gnome', 'aurora', etc.]
-    runtime_info: Optional[Dict] = None
+    runtime_info: Optional[AppMetadata] = None
     current_runtime: Optional[str] = None
+    runtimes: Dict[str, str] = field(default_factory=dict)  # arch -> runtime ref
+    fingerprints: Dict[str, str] = field(default_factory=dict)  # arch -> fingerprint of the runtime's source data
+    remote: str = DEFAULT_REMOTE
+
+
+class RuntimeCatalog:
+    """Latest stable branch of every runtime on a remote, resolved once per run.
+    
+    The remote is listed with a single ``flatpak remote-ls`` call, parsed once,
+    and lookups are memoized so per-app cost is a dict lookup. Resolved
+    branches are saved to ``catalog_file`` and used as a fallback when the
+    listing is unavailable.
+    """
+    
+    def __init__(self, remote: str = 'flathub', arch: str = 'x86_64', catalog_file: Optional[str] = None,
+                 fallback: Optional[Callable[[str], Optional[str]]] = None,
+                 runner: Callable[..., subprocess.CompletedProcess] = subprocess.run):
+        self.remote = remote
+        self.arch = arch
+        self.catalog_file = catalog_file
+        self.fallback = fallback
+        self.runner = runner
+        self._branches: Optional[Dict[str, List[str]]] = None
+        self._latest: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+    
+    def _list_runtime_refs(self) -> Optional[str]:
+        """Run the remote listing subprocess and return its raw output."""
+        cmd = ['flatpak', 'remote-ls', '--runtime', f'--arch={self.arch}', '--columns=ref', self.remote]
+        try:
+            result = self.runner(cmd, capture_output=True, text=True, timeout=120)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not list runtimes on {self.remote}: {e}")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"Could not list runtimes on {self.remote}: {result.stderr.strip()}")
+            return None
+        return result.stdout
+    
+    @staticmethod
+    def parse_runtime_refs(listing: str) -> Dict[str, List[str]]:
+        """Parse runtime refs (runtime/name/arch/branch) into a name -> branches mapping."""
+        branches = {}
+        for line in listing.splitlines():
+            ref = line.strip().split('\t')[0]
+            if ref.startswith('runtime/'):
+                ref = ref[len('runtime/'):]
+            parts = ref.split('/')
+            if len(parts) != 3:
+                continue
+            branches.setdefault(parts[0], []).append(parts[2])
+        return branches
+    
+    @staticmethod
+    def latest_stable_branch(branches: List[str]) -> Optional[str]:
+        """Pick the highest numeric branch, ignoring branches like 'beta', 'master' or '5.15-24.08'."""
+        stable = [b for b in branches if STABLE_BRANCH_PATTERN.match(b)]
+        if not stable:
+            return None
+        return max(stable, key=lambda b: tuple(int(x) for x in b.split('.')))
+    
+    def load_listing(self, listing: str):
+        """Use an already fetched runtime listing instead of running our own."""
+        with self._lock:
+            self._branches = self.parse_runtime_refs(listing)
+    
+    def _load_catalog_file(self) -> Dict[str, str]:
+        if not self.catalog_file:
+            return {}
+        try:
+            with open(self.catalog_file, 'r') as f:
+                return json.load(f).get('runtimes', {})
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_catalog_file(self, resolved: Dict[str, str]):
+        if not self.catalog_file or not resolved:
+            return
+        runtimes = self._load_catalog_file()
+        runtimes.update(resolved)
+        try:
+            os.makedirs(os.path.dirname(self.catalog_file) or '.', exist_ok=True)
+            with open(self.catalog_file, 'w') as f:
+                json.dump({'remote': self.remote, 'arch': self.arch, 'runtimes': runtimes}, f, indent=2, sort_keys=True)
+        except OSError as e:
+            logger.debug(f"Could not save runtime catalog: {e}")
+    
+    def resolve(self, runtime_names: Set[str]):
+        """Resolve the latest branch of each runtime, listing the remote at most once."""
+        with self._lock:
+            pending = sorted(name for name in runtime_names if name not in self._latest)
+            if not pending:
+                return
+            
+            if self._branches is None:
+                listing = self._list_runtime_refs()
+                self._branches = self.parse_runtime_refs(listing) if listing else {}
+                logger.info(f"Runtime catalog: {len(self._branches)} runtimes listed on {self.remote} for {self.arch}")
+            
+            previous = None
+            discovered = {}
+            for name in pending:
+                latest = self.latest_stable_branch(self._branches.get(name, []))
+                origin = f"{self.remote} {self.arch} listing"
+                if latest:
+                    discovered[name] = latest
+                if latest is None and self.fallback:
+                    latest = self.fallback(name)
+                    origin = "Flathub API"
+                if latest is None:
+                    if previous is None:
+                        previous = self._load_catalog_file()
+                    latest = previous.get(name)
+                    origin = "last saved catalog"
+                
+                self._latest[name] = latest
+                if latest:
+                    logger.info(f"Latest version of runtime {name} on {self.arch} is {latest} (from {origin})")
+                else:
+                    logger.warning(f"Could not determine latest version for runtime {name} on {self.arch}")
+            
+            self._save_catalog_file(discovered)
+    
+    def reset(self):
+        """Forget the listing and resolved branches so the next resolve lists the remote again."""
+        with self._lock:
+            self._branches = None
+            self._latest = {}
+    
+    def latest_branch(self, runtime_name: str) -> Optional[str]:
+        """Return the memoized latest branch of a runtime."""
+        if runtime_name not in self._latest:
+            self.resolve({runtime_name})
+        return self._latest.get(runtime_name)
+
+
+class DeadlineExceeded(Exception):
+    """Raised by lookups that start after the --deadline has passed."""
+
+
+class CatalogUnavailable(Exception):
+    """Raised when no runtime in use could be resolved to a latest branch on any arch."""
+
+
+class LatencyTracker:
+    """Rolling window of recent Flathub lookup latencies."""
+    
+    def __init__(self, window: int = 200):
+        self._samples = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Latency at the given percentile, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+class Checkpoint:
+    """Per-app lookup results of an in-progress run, saved periodically to disk.
+    
+    Lets an interrupted run be resumed without repeating lookups that already
+    finished. The file is removed once a run completes successfully.
+    """
+    
+    def __init__(self, path: str, interval: int = CHECKPOINT_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._entries: Dict[str, Dict] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+    
+    def load(self, max_age: int) -> Dict[str, Optional[str]]:
+        """Load results newer than max_age seconds, returning flatpak ID -> runtime."""
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f).get('apps', {})
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        with self._lock:
+            self._entries = {fid: entry for fid, entry in entries.items()
+                             if now - entry.get('checked_at', 0) < max_age}
+            return {fid: entry.get('runtime') for fid, entry in self._entries.items()}
+    
+    def record(self, flatpak_id: str, runtime: Optional[str]):
+        """Record a finished app, saving every ``interval`` records."""
+        with self._lock:
+            self._entries[flatpak_id] = {'runtime': runtime, 'checked_at': time.time()}
+            self._unsaved += 1
+            if self._unsaved >= self.interval:
+                self._save()
+    
+    def flush(self):
+        with self._lock:
+            if self._unsaved:
+                self._save()
+    
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump({'apps': self._entries}, f)
+            os.replace(tmp_path, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint {self.path}: {e}")
+    
+    def clear(self):
+        """Remove the checkpoint after a successful run."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove checkpoint {self.path}: {e}")
 
 
 class FlatpakRuntimeChecker:
-    def __init__(self, output_file: str = None):
-        self.flathub_base_url = "https://flathub.org/api/v2/appstream"
+    def __init__(self, output_file: str = None, workers: int = DEFAULT_WORKERS,
+                 cache: Optional[ResponseCache] = None, source_cache: Optional[ResponseCache] = None,
+                 catalog_file: Optional[str] = None, bulk: bool = False, summary_file: Optional[str] = None,
+                 state_file: Optional[str] = None, shard: Optional[Tuple[int, int]] = None,
+                 checkpoint_file: Optional[str] = None, resume: bool = False,
+                 resume_max_age: int = DEFAULT_RESUME_MAX_AGE, deadline: Optional[float] = None,
+                 stats_cache: Optional[ResponseCache] = None, arches: Optional[List[str]] = None,
+                 remotes: Optional[Dict[str, RemoteBackend]] = None, app_remotes: Optional[Dict[str, str]] = None,
+                 budget: Optional[int] = None, max_check_age: int = DEFAULT_MAX_CHECK_AGE,
+                 snapshot: Optional[Snapshot] = None):
+        self.flathub_base_url = BUILTIN_REMOTES[DEFAULT_REMOTE]['api_url']
         self.output_file = output_file or "outdated_packages.json"
-        
-    def fetch_flatpak_list(self) -> Dict[str, FlatpakInfo]:
-        """Fetch and merge flatpak lists from multiple ublue-os sources with deduplication."""
-        
-        # Define all sources with their URLs and formats
-        sources = {
-            'bluefin': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/bluefin/main/flatpaks/system-flatpaks.list',
-                'format': 'app_prefix'  # already has app/ prefix
-            },
-            'aurora': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/aurora/main/flatpaks/system-flatpaks.list', 
-                'format': 'no_prefix'  # needs app/ prefix added
-            },
-            'bazzite-gnome': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/installer/gnome_flatpaks/flatpaks',
-                'format': 'full_ref'  # app/package/arch/branch format
-            },
-            'bazzite-kde': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/installer/kde_flatpaks/flatpaks',
-                'format': 'full_ref'  # app/package/arch/branch format
-            },
-            # Bazaar config sources
-            'bluefin-bazaar': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/bluefin/main/system_files/shared/etc/bazaar/config.yaml',
-                'format': 'bazaar_yaml'  # YAML format with appids in sections
-            },
-            'aurora-bazaar': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/aurora/main/system_files/shared/etc/bazaar/config.yaml',
-                'format': 'bazaar_yaml'  # YAML format with appids in sections
-            },
-            'bazzite-bazaar': {
-                'url': 'https://raw.githubusercontent.com/ublue-os/bazzite/main/system_files/desktop/shared/usr/share/ublue-os/bazaar/config.yaml',
-                'format': 'bazaar_yaml'  # YAML format with appids in sections
-            }
+        self.workers = max(1, workers)
+        # Connection pool sized for the lookup workers, plus their hedged duplicates;
+        # Flathub requests in flight adapt between one and the pool size
+        pool_size = self.workers * (2 if deadline is not None else 1)
+        self.session = create_session(pool_maxsize=pool_size, max_concurrency=pool_size)
+        # Source lists get their own session whose retries stay within SOURCE_TIMEOUT in total
+        self.source_session = create_session(pool_maxsize=len(SOURCES), max_elapsed=SOURCE_TIMEOUT)
+        # Offline runs answer every request and remote listing from a stored snapshot
+        self.snapshot = snapshot
+        runner = subprocess.run
+        if snapshot:
+            self.session = snapshot.session(self.session)
+            self.source_session = snapshot.session(self.source_session)
+            runner = snapshot.run
+        self.cache = cache
+        self.source_cache = source_cache
+        # Flathub shares the checker's session and cache; other remotes bring their own
+        self.remotes = {DEFAULT_REMOTE: RemoteBackend(DEFAULT_REMOTE, api_url=self.flathub_base_url,
+                                                      workers=self.workers, cache=cache, session=self.session,
+                                                      runner=runner)}
+        self.remotes.update({name: backend for name, backend in (remotes or {}).items() if name != DEFAULT_REMOTE})
+        self.app_remotes = app_remotes or {}
+        self.arches = list(dict.fromkeys(arches or [APPSTREAM_ARCH]))
+        self.runtime_catalogs = {
+            arch: RuntimeCatalog(arch=arch, catalog_file=arch_path(catalog_file, arch),
+                                 fallback=self.get_runtime_version_from_api, runner=runner)
+            for arch in self.arches
         }
+        self.runtime_catalog = self.runtime_catalogs[self.arches[0]]
+        self.summary_file = summary_file
+        self.bulk = bulk or bool(summary_file)
+        self.state_file = state_file
+        self.shard = shard
+        self.checkpoint = Checkpoint(checkpoint_file) if checkpoint_file else None
+        self.resume = resume
+        self.resume_max_age = resume_max_age
+        self.deadline = deadline
+        self.stats_cache = stats_cache
+        # Read-only view of the download stats store kept by issue_generator
+        self.download_stats = DownloadStats(stats_cache) if stats_cache else None
+        self.latency = LatencyTracker()
+        self.hedge_stats = {'hedged': 0, 'hedge_wins': 0}
+        self.unchecked: Set[str] = set()
+        self.failed_lookups: Set[str] = set()
+        self.budget = budget
+        self.max_check_age = max_check_age
+        self.deferred: Set[str] = set()
+        # Results of the last run, replaced as a whole when a run finishes
+        self.results: Dict = {}
+        # Targeted rechecks: source lists to use instead of fetching, and the only apps to check
+        self.source_overrides: Dict[str, List[str]] = {}
+        self.focus: Optional[Set[str]] = None
+        self._fetched: Dict[str, Optional[List[str]]] = {}
+        self._state_data: Dict = {}
+        # Check state of the previous run, and fingerprints of the appstream documents fetched in this one
+        self._previous_state: Dict[str, Dict] = {}
+        self._appstream_fingerprints: Dict[str, str] = {}
+        self.unparsed = 0
+        self._deadline_at: Optional[float] = None
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def _get(self, url: str, timeout: float = LOOKUP_TIMEOUT, remote: str = DEFAULT_REMOTE):
+        """GET an appstream URL from a remote, through its response cache when one is configured."""
+        return self.remotes[remote].get(url, timeout)
+    
+    def remote_of(self, flatpak_id: str) -> str:
+        """Name of the remote an app is resolved from."""
+        return self.app_remotes.get(flatpak_id.replace('app/', ''), DEFAULT_REMOTE)
         
+    def _merge_sources(self, fetched: List[Optional[List[str]]]) -> Dict[str, FlatpakInfo]:
+        """Merge parsed source lists (in SOURCES order) into a deduplicated dictionary."""
         # Dictionary to store deduplicated flatpaks with source tracking
         flatpak_dict = {}
         
-        for source_name, source_config in sources.items():
-            logger.info(f"Fetching flatpaks from {source_name}")
+        for source_name, source_flatpaks in zip(SOURCES, fetched):
+            if source_flatpaks is None:
+                continue
             
-            try:
-                response = requests.get(source_config['url'], timeout=30)
-                response.raise_for_status()
-                
-                source_flatpaks = []
-                
-                if source_config['format'] == 'bazaar_yaml':
-                    # Parse YAML and extract appids from all sections
-                    source_flatpaks = self._parse_bazaar_yaml(response.text)
+            # Add to deduplicated dictionary
+            for flatpak_id in source_flatpaks:
+                if flatpak_id in flatpak_dict:
+                    # Flatpak already exists, add this source
+                    flatpak_dict[flatpak_id].sources.append(source_name)
                 else:
-                    # Handle existing list formats
-                    for line in response.text.strip().split('\n'):
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            # Normalize to app/package.id format
-                            if source_config['format'] == 'app_prefix':
-                                # Already correct format: app/package.id
-                                flatpak_id = line
-                            elif source_config['format'] == 'no_prefix':
-                                # Add app/ prefix: package.id -> app/package.id
-                                flatpak_id = f"app/{line}"
-                            elif source_config['format'] == 'full_ref':
-                                # Extract package ID: app/package.id/arch/branch -> app/package.id
-                                parts = line.split('/')
-                                if len(parts) >= 2:
-                                    flatpak_id = f"{parts[0]}/{parts[1]}"
-                                else:
-                                    flatpak_id = line
-                            else:
-                                flatpak_id = line
-                            
-                            # Only include app flatpaks (not runtimes)
-                            if flatpak_id.startswith('app/'):
-                                source_flatpaks.append(flatpak_id)
-                
-                logger.info(f"Found {len(source_flatpaks)} flatpaks from {source_name}")
-                
-                # Add to deduplicated dictionary
-                for flatpak_id in source_flatpaks:
-                    if flatpak_id in flatpak_dict:
-                        # Flatpak already exists, add this source
-                        flatpak_dict[flatpak_id].sources.append(source_name)
-                    else:
-                        # New flatpak
-                        flatpak_dict[flatpak_id] = FlatpakInfo(
-                            flatpak_id=flatpak_id,
-                            sources=[source_name]
-                        )
-                        
-            except requests.RequestException as e:
-                logger.error(f"Failed to fetch flatpak list from {source_name}: {e}")
-                # Continue with other sources instead of failing completely
-                continue
-            except Exception as e:
-                logger.error(f"Error processing {source_name}: {e}")
-                # Continue with other sources instead of failing completely
-                continue
+                    # New flatpak
+                    flatpak_dict[flatpak_id] = FlatpakInfo(
+                        flatpak_id=flatpak_id,
+                        sources=[source_name],
+                        remote=self.remote_of(flatpak_id)
+                    )
         
         total_unique = len(flatpak_dict)
         total_sources = sum(len(info.sources) for info in flatpak_dict.values())
@@ -150,6 +491,123 @@ class FlatpakRuntimeChecker:
         
         return flatpak_dict
     
+    def _fetch_source(self, source_name: str, source_config: Dict) -> Optional[List[str]]:
+        """Fetch and parse a single source list.
+        
+        Uses a conditional GET when a cached copy exists and falls back to the
+        last known good copy if the upstream is slow or down.
+        """
+        if source_name in self.source_overrides:
+            return self.source_overrides[source_name]
+        logger.info(f"Fetching flatpaks from {source_name}")
+        url = source_config['url']
+        
+        content = None
+        try:
+            if self.source_cache:
+                response = self.source_cache.get(self.source_session, url, timeout=SOURCE_TIMEOUT)
+            else:
+                response = self.source_session.get(url, timeout=SOURCE_TIMEOUT)
+            if response.status_code == 200:
+                content = response.text
+            else:
+                logger.error(f"Failed to fetch flatpak list from {source_name}: HTTP {response.status_code}")
+        except requests.RequestException as e:
+            logger.error(f"Failed to fetch flatpak list from {source_name}: {e}")
+        
+        if content is None:
+            content = self.source_cache.get_stale(url) if self.source_cache else None
+            if content is None:
+                logger.error(f"No last known good copy of {source_name}, skipping it")
+                return None
+            logger.warning(f"Using last known good copy of {source_name}")
+        
+        try:
+            source_flatpaks = self._parse_source_cached(source_name, content, source_config['format'])
+        except Exception as e:
+            logger.error(f"Error processing {source_name}: {e}")
+            return None
+        
+        logger.info(f"Found {len(source_flatpaks)} flatpaks from {source_name}")
+        return source_flatpaks
+    
+    def _parse_source_cached(self, source_name: str, content: str, source_format: str) -> List[str]:
+        """Parse source content, reusing the stored result if the content hash is unchanged.
+        
+        Each source keeps a single stored result, replaced when its content changes.
+        """
+        if not self.source_cache:
+            return self._parse_source(content, source_format)
+        
+        digest = hashlib.sha256(f"{source_format}\n{content}".encode('utf-8')).hexdigest()
+        parsed_dir = os.path.join(self.source_cache.directory, 'parsed')
+        parsed_path = os.path.join(parsed_dir, f"{source_name}.json")
+        try:
+            with open(parsed_path, 'r') as f:
+                stored = json.load(f)
+            if stored.get('digest') == digest:
+                return stored['apps']
+        except (OSError, ValueError, AttributeError, KeyError):
+            pass
+        
+        source_flatpaks = self._parse_source(content, source_format)
+        try:
+            os.makedirs(parsed_dir, exist_ok=True)
+            with open(parsed_path, 'w') as f:
+                json.dump({'digest': digest, 'apps': source_flatpaks}, f)
+        except OSError as e:
+            logger.debug(f"Could not store parsed source list: {e}")
+        return source_flatpaks
+    
+    def _prune_parsed_sources(self):
+        """Remove stored parse results of sources that are no longer configured."""
+        parsed_dir = os.path.join(self.source_cache.directory, 'parsed')
+        try:
+            names = os.listdir(parsed_dir)
+        except OSError:
+            return
+        for name in names:
+            if name[:-len('.json')] not in SOURCES:
+                try:
+                    os.remove(os.path.join(parsed_dir, name))
+                except OSError as e:
+                    logger.debug(f"Could not remove stale parsed source list {name}: {e}")
+    
+    def _parse_source(self, content: str, source_format: str) -> List[str]:
+        """Parse the raw content of a source list into app/package.id entries."""
+        if source_format == 'bazaar_yaml':
+            # Parse YAML and extract appids from all sections
+            return self._parse_bazaar_yaml(content)
+        
+        source_flatpaks = []
+        
+        # Handle existing list formats
+        for line in content.strip().split('\n'):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                # Normalize to app/package.id format
+                if source_format == 'app_prefix':
+                    # Already correct format: app/package.id
+                    flatpak_id = line
+                elif source_format == 'no_prefix':
+                    # Add app/ prefix: package.id -> app/package.id
+                    flatpak_id = f"app/{line}"
+                elif source_format == 'full_ref':
+                    # Extract package ID: app/package.id/arch/branch -> app/package.id
+                    parts = line.split('/')
+                    if len(parts) >= 2:
+                        flatpak_id = f"{parts[0]}/{parts[1]}"
+                    else:
+                        flatpak_id = line
+                else:
+                    flatpak_id = line
+                
+                # Only include app flatpaks (not runtimes)
+                if flatpak_id.startswith('app/'):
+                    source_flatpaks.append(flatpak_id)
+        
+        return source_flatpaks
+    
     def _parse_bazaar_yaml(self, yaml_content: str) -> List[str]:
         """Parse bazaar config YAML and extract all appids from all sections."""
         try:
@@ -188,99 +646,493 @@ class FlatpakRuntimeChecker:
         """Filter to get only app flatpaks (not runtimes) - all should already be apps."""
         return {fid: info for fid, info in flatpak_dict.items() if fid.startswith('app/')}
     
-    def get_flatpak_info(self, flatpak_id: str) -> Optional[Dict]:
-        """Get flatpak information from Flathub API."""
+    def get_flatpak_info(self, flatpak_id: str) -> Optional[AppMetadata]:
+        """Get flatpak information from the appstream API of its remote, projected to the fields we use."""
         # Remove 'app/' prefix for API call
         app_id = flatpak_id.replace('app/', '')
+        remote = self.remote_of(flatpak_id)
+        url = self.remotes[remote].appstream_url(app_id)
+        if url is None:
+            logger.warning(f"{remote} has no appstream API to look up {app_id}")
+            return None
         
         try:
-            response = requests.get(f"{self.flathub_base_url}/{app_id}", timeout=30)
+            response = self._lookup(url, remote)
             if response.status_code == 200:
-                return response.json()
+                fingerprint = self.fingerprint(response.text)
+                self._appstream_fingerprints[flatpak_id] = fingerprint
+                # An unchanged document yields the runtime it did last run, without decoding it again
+                previous = self._previous_state.get(state_key(flatpak_id, APPSTREAM_ARCH))
+                if previous and previous.get('fingerprint') == fingerprint and previous.get('runtime'):
+                    with self._lock:
+                        self.unparsed += 1
+                    return AppMetadata(bundle_runtime=previous['runtime'])
+                return AppMetadata.from_json(response.text)
             else:
                 logger.warning(f"Could not fetch info for {app_id}: HTTP {response.status_code}")
                 return None
         except requests.RequestException as e:
             logger.warning(f"Failed to fetch info for {app_id}: {e}")
             return None
+        except ValueError as e:
+            logger.warning(f"Invalid appstream data for {app_id}: {e}")
+            return None
     
-    def get_runtime_from_flatpak_info(self, flatpak_info: Dict) -> Optional[str]:
-        """Extract runtime information from flatpak metadata."""
-        try:
-            # Look for runtime in bundle information
-            if 'bundle' in flatpak_info:
-                bundle = flatpak_info['bundle']
-                if 'runtime' in bundle:
-                    return bundle['runtime']
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the --deadline, or None when running without one."""
+        if self._deadline_at is None:
+            return None
+        return self._deadline_at - time.monotonic()
+    
+    def lookup_timeout(self) -> float:
+        """Timeout for the next lookup, adapted to observed latency and capped by the deadline."""
+        timeout = LOOKUP_TIMEOUT
+        p99 = self.latency.percentile(99)
+        if p99 is not None:
+            timeout = min(LOOKUP_TIMEOUT, max(MIN_LOOKUP_TIMEOUT, ADAPTIVE_TIMEOUT_FACTOR * p99))
+        remaining = self.remaining()
+        if remaining is not None:
+            timeout = max(0.1, min(timeout, remaining))
+        return timeout
+    
+    def _lookup(self, url: str, remote: str = DEFAULT_REMOTE):
+        """GET an appstream URL; --deadline runs use adaptive timeouts and hedging."""
+        if self._hedge_executor is None:
+            return self._get(url, remote=remote)
+        return self._hedged_get(url, remote)
+    
+    def _timed_get(self, url: str, timeout: float, remote: str = DEFAULT_REMOTE):
+        started = time.monotonic()
+        response = self._get(url, timeout=timeout, remote=remote)
+        # Fresh cache hits never touch the network and would drag the percentiles down
+        if not getattr(response, 'from_cache', False) or getattr(response, 'revalidated', False):
+            self.latency.record(time.monotonic() - started)
+        return response
+    
+    def _hedged_get(self, url: str, remote: str = DEFAULT_REMOTE):
+        """GET with a duplicate request once the first outlasts the hedge percentile.
+        
+        Whichever copy succeeds first wins; the other is left to finish in the background.
+        """
+        timeout = self.lookup_timeout()
+        primary = self._hedge_executor.submit(self._timed_get, url, timeout, remote)
+        hedge_after = self.latency.percentile(HEDGE_PERCENTILE)
+        if hedge_after is None or hedge_after >= timeout or wait([primary], timeout=hedge_after).done:
+            return primary.result()
+        
+        with self._lock:
+            self.hedge_stats['hedged'] += 1
+        hedge = self._hedge_executor.submit(self._timed_get, url, max(0.1, timeout - hedge_after), remote)
+        for future in as_completed([primary, hedge]):
+            if future.exception() is None:
+                if future is hedge:
+                    with self._lock:
+                        self.hedge_stats['hedge_wins'] += 1
+                return future.result()
+        return primary.result()
+    
+    def _lookup_within_deadline(self, flatpak_id: str) -> Optional[AppMetadata]:
+        """``get_flatpak_info`` for --deadline runs; raises DeadlineExceeded once the budget is spent."""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(flatpak_id)
+        runtime_info = self.get_flatpak_info(flatpak_id)
+        if runtime_info is None and self.remaining() <= 0:
+            # Most likely timed out against the deadline rather than a genuine failure
+            raise DeadlineExceeded(flatpak_id)
+        return runtime_info
+    
+    def download_count(self, flatpak_id: str) -> int:
+        """Monthly downloads from the cached Flathub stats, or 0 if never fetched."""
+        if not self.download_stats:
+            return 0
+        return self.download_stats.stored(flatpak_id) or 0
+    
+    def importance(self, flatpak_info: FlatpakInfo) -> Tuple[int, int]:
+        """Sort key for --deadline runs: apps in more sources, then more downloads, go first."""
+        return len(flatpak_info.sources), self.download_count(flatpak_info.flatpak_id)
+    
+    def refresh_priority(self, flatpak_id: str, entry: Dict, now: float) -> float:
+        """Scheduler score: staleness, plus recent runtime changes and popularity. Higher goes first."""
+        staleness = (now - entry['last_checked']) / self.max_check_age
+        recent_changes = sum(1 for changed_at in entry.get('changes', []) if now - changed_at < CHANGE_WINDOW)
+        popularity = math.log10(1 + self.download_count(flatpak_id))
+        return staleness + CHANGE_WEIGHT * recent_changes + POPULARITY_WEIGHT * popularity
+    
+    def schedule(self, candidates: List[str]) -> List[str]:
+        """Pick the apps to look up this run within the --budget of appstream lookups.
+        
+        Apps never checked or last checked more than ``max_check_age`` ago are
+        always picked, even past the budget. The rest of the budget goes to the
+        apps with the highest ``refresh_priority``; the others are recorded in
+        ``deferred`` and their previous verdicts are carried forward.
+        
+        Apps whose lookup failed are skipped until their ``FAILURE_BACKOFF``
+        has elapsed; they are carried forward if they were ever checked and
+        reported as unchecked otherwise.
+        """
+        now = time.time()
+        history = self._load_schedule()
+        overdue = []
+        ranked = []
+        backing_off = set()
+        for flatpak_id in candidates:
+            entry = history.get(flatpak_id)
+            failures = entry.get('failures', 0) if entry else 0
+            if failures and now - entry['last_failed'] < min(FAILURE_BACKOFF * 2 ** (failures - 1), self.max_check_age):
+                if 'last_checked' in entry:
+                    backing_off.add(flatpak_id)
+                else:
+                    self.unchecked.add(flatpak_id)
+                continue
+            if not entry or now - entry.get('last_checked', 0) >= self.max_check_age:
+                overdue.append(flatpak_id)
+            else:
+                ranked.append((self.refresh_priority(flatpak_id, entry, now), flatpak_id))
+        
+        ranked.sort(key=lambda item: item[0], reverse=True)
+        room = max(0, self.budget - len(overdue))
+        selected = overdue + [flatpak_id for _, flatpak_id in ranked[:room]]
+        self.deferred = set(flatpak_id for _, flatpak_id in ranked[room:]) | backing_off
+        
+        if len(overdue) > self.budget:
+            logger.warning(f"{len(overdue)} apps are due for a check, exceeding the budget of {self.budget} lookups")
+        logger.info(f"Scheduler: {len(overdue)} apps due, {len(selected) - len(overdue)} picked by priority, "
+                    f"{len(self.deferred)} carried forward from earlier runs")
+        if backing_off or self.unchecked:
+            logger.info(f"Scheduler: {len(backing_off) + len(self.unchecked)} apps with failed lookups are backing off")
+        return selected
+    
+    def load_bulk_index(self, arch: str = APPSTREAM_ARCH, remote: str = DEFAULT_REMOTE) -> Dict[str, str]:
+        """Build an app ID -> runtime index from one listing of a whole remote for one arch.
+        
+        The listing comes from ``flatpak remote-ls --columns=ref,runtime`` or, for
+        flathub, from a saved copy of it (``summary_file``, which may contain
+        ``{arch}``; without it the file is only used for x86_64). Lines may be either
+        ``ref<TAB>runtime`` or ``application<TAB>runtime``. Runtime refs in a flathub
+        listing seed that arch's runtime catalog so it does not need a listing of its own.
+        """
+        summary_file = None
+        if remote == DEFAULT_REMOTE and self.summary_file and '{arch}' in self.summary_file:
+            summary_file = self.summary_file.format(arch=arch)
+        elif remote == DEFAULT_REMOTE and self.summary_file and arch == APPSTREAM_ARCH:
+            summary_file = self.summary_file
+        
+        if summary_file:
+            try:
+                with open(summary_file, 'r') as f:
+                    listing = f.read()
+                logger.info(f"Reading remote summary for {arch} from {summary_file}")
+            except OSError as e:
+                logger.error(f"Could not read summary file {summary_file}: {e}")
+                return {}
+        else:
+            listing = self.remotes[remote].list_apps(arch)
+            if listing is None:
+                return {}
+        
+        index = {}
+        runtime_refs = []
+        for line in listing.splitlines():
+            columns = line.strip().split('\t')
+            ref = columns[0].strip()
+            if not ref:
+                continue
+            if ref.startswith('runtime/'):
+                runtime_refs.append(ref)
+                continue
+            runtime = columns[1].strip() if len(columns) > 1 else ''
+            if ref.startswith('app/'):
+                ref = ref.split('/')[1]
+            if runtime and '/' not in ref:
+                index[ref] = runtime
+        
+        if runtime_refs and remote == DEFAULT_REMOTE and arch in self.runtime_catalogs:
+            self.runtime_catalogs[arch].load_listing('\n'.join(runtime_refs))
+        
+        logger.info(f"Bulk index for {remote} {arch}: {len(index)} apps and {len(runtime_refs)} runtime refs")
+        return index
+    
+    def in_shard(self, flatpak_id: str) -> bool:
+        """Whether an app belongs to this process's shard (stable across runs) and recheck focus."""
+        if self.focus is not None and flatpak_id not in self.focus:
+            return False
+        if not self.shard:
+            return True
+        index, count = self.shard
+        digest = hashlib.sha256(flatpak_id.encode('utf-8')).digest()
+        return int.from_bytes(digest[:8], 'big') % count == index - 1
+    
+    def collect_app_runtimes(self) -> Dict[str, FlatpakInfo]:
+        """Fetch all sources and resolve the runtime of every app as a streaming pipeline.
+        
+        App IDs flow from each source parser through a dedup stage straight into
+        the lookup workers, so a slow source does not hold back lookups of apps
+        already seen elsewhere. In bulk mode, apps found in the remote index skip
+        the lookup entirely. Source membership is merged in SOURCES order once
+        every source has finished, so it does not depend on which fetch finished first.
+        
+        Appstream only carries the x86_64 runtime, so other arches are read from
+        a listing of the remote per arch, fetched alongside the sources. Each app
+        is looked up at most once however many arches are checked. Every remote
+        in use is listed and looked up on its own workers, in parallel with the
+        others; remotes without an appstream API are resolved from listings alone.
+        
+        With a deadline, lookups are held until every source is merged and then
+        run in order of importance, so whatever is left unchecked when the budget
+        runs out is the least important; those apps are recorded in ``unchecked``.
+        So are apps whose lookup failed, including lookups refused by an open
+        circuit breaker, so a run that lost Flathub never reports them as up to date.
+        """
+        seen = set()
+        indexes = None
+        listed = {}
+        bulk_hits = set()
+        lookup_futures = {}
+        pending = []
+        backing_off = 0
+        
+        if self.deadline is not None:
+            if self._deadline_at is None:
+                self._deadline_at = time.monotonic() + self.deadline
+            # Retries must not sleep past the deadline either
+            for backend in self.remotes.values():
+                backend.session.deadline = self._deadline_at
+            self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self.workers)
+        
+        resumed = {}
+        if self.resume and self.checkpoint:
+            resumed = self.checkpoint.load(self.resume_max_age)
+            logger.info(f"Resuming: {len(resumed)} apps finished within the last {self.resume_max_age}s will be skipped")
+        
+        used_remotes = [name for name in self.remotes
+                        if name == DEFAULT_REMOTE or name in self.app_remotes.values()]
+        listings = [(remote, arch) for remote in used_remotes for arch in self.arches
+                    if self.bulk or arch != APPSTREAM_ARCH or not self.remotes[remote].api_url]
+        with ThreadPoolExecutor(max_workers=len(SOURCES) + len(listings) + 1) as source_executor, \
+                contextlib.ExitStack() as stack:
+            lookup_executors = {
+                remote: stack.enter_context(ThreadPoolExecutor(max_workers=self.remotes[remote].workers))
+                for remote in used_remotes if self.remotes[remote].api_url
+            }
+            index_futures = {listing: source_executor.submit(self.load_bulk_index, listing[1], listing[0])
+                             for listing in listings}
+            source_futures = {
+                source_executor.submit(self._fetch_source, source_name, source_config): source_name
+                for source_name, source_config in SOURCES.items()
+            }
+            
+            lookup = self._lookup_within_deadline if self.deadline is not None else self.get_flatpak_info
+            
+            def submit_lookup(flatpak_id: str):
+                lookup_futures[flatpak_id] = lookup_executors[self.remote_of(flatpak_id)].submit(lookup, flatpak_id)
+                if self.checkpoint:
+                    lookup_futures[flatpak_id].add_done_callback(
+                        functools.partial(self._checkpoint_lookup, flatpak_id))
+            
+            fetched = {}
+            for future in as_completed(source_futures):
+                source_name = source_futures[future]
+                fetched[source_name] = future.result()
+                if indexes is None:
+                    indexes = {listing: index_future.result() for listing, index_future in index_futures.items()}
+                    # An arch whose listing failed falls back to the appstream runtime
+                    failed_listings = {listing for listing, index in indexes.items() if not index}
+                    for remote, arch in sorted(failed_listings):
+                        if arch != APPSTREAM_ARCH and self.remotes[remote].api_url:
+                            logger.warning(f"No {remote} listing for {arch}, deriving its runtimes from appstream")
+                
+                # Dedup stage: dispatch each app the first time any source mentions it
+                new_ids = [fid for fid in fetched[source_name] or [] if fid.startswith('app/') and fid not in seen]
+                for flatpak_id in new_ids:
+                    seen.add(flatpak_id)
+                    if not self.in_shard(flatpak_id):
+                        continue
+                    app_id = flatpak_id.replace('app/', '')
+                    remote = self.remote_of(flatpak_id)
+                    listed[flatpak_id] = {arch: index[app_id] for (name, arch), index in indexes.items()
+                                          if name == remote and app_id in index}
+                    if flatpak_id in resumed:
+                        continue
+                    failed_arches = {arch for name, arch in failed_listings if name == remote}
+                    if not self.remotes[remote].api_url or not any(
+                            arch not in listed[flatpak_id] and (arch == APPSTREAM_ARCH or arch in failed_arches)
+                            for arch in self.arches):
+                        bulk_hits.add(flatpak_id)
+                        if self.checkpoint and APPSTREAM_ARCH in listed[flatpak_id]:
+                            self.checkpoint.record(flatpak_id, listed[flatpak_id][APPSTREAM_ARCH])
+                    elif self.deadline is not None or self.budget is not None:
+                        pending.append(flatpak_id)
+                    else:
+                        submit_lookup(flatpak_id)
+                logger.debug(f"{source_name} added {len(new_ids)} new apps to the lookup queue")
+            
+            self._fetched = fetched
+            if self.source_cache:
+                self._prune_parsed_sources()
+            app_flatpaks = self.get_app_flatpaks(self._merge_sources([fetched[name] for name in SOURCES]))
+            
+            if pending and self.budget is not None:
+                pending = self.schedule(pending)
+                backing_off = len(self.unchecked)
+            if pending and self.deadline is not None:
+                pending.sort(key=lambda fid: self.importance(app_flatpaks[fid]), reverse=True)
+                logger.info(f"Looking up {len(pending)} apps by importance with {self.remaining():.0f}s "
+                            f"left of the {self.deadline:.0f}s deadline")
+            for flatpak_id in pending:
+                submit_lookup(flatpak_id)
+            
+            if listings:
+                logger.info(f"Resolved {len(bulk_hits)} apps from remote listings, "
+                            f"{len(lookup_futures)} needed appstream lookups")
             
-            # Alternative: check in metadata
-            if 'metadata' in flatpak_info:
-                metadata = flatpak_info['metadata']
-                if 'runtime' in metadata:
-                    return metadata['runtime']
+            for flatpak_id, flatpak_info in app_flatpaks.items():
+                if not self.in_shard(flatpak_id) or flatpak_id in self.deferred or flatpak_id in self.unchecked:
+                    continue
+                appstream_runtime = None
+                if flatpak_id in resumed:
+                    appstream_runtime = resumed[flatpak_id]
+                elif flatpak_id in lookup_futures:
+                    future = lookup_futures[flatpak_id]
+                    try:
+                        remaining = self.remaining()
+                        runtime_info = future.result(timeout=None if remaining is None else max(0, remaining))
+                    except (DeadlineExceeded, FuturesTimeout):
+                        future.cancel()
+                        self.unchecked.add(flatpak_id)
+                        continue
+                    if not runtime_info:
+                        logger.warning(f"Could not get info for {flatpak_id}, leaving it unchecked")
+                        self.unchecked.add(flatpak_id)
+                        self.failed_lookups.add(flatpak_id)
+                        continue
                     
-            return None
-        except (KeyError, TypeError) as e:
-            logger.debug(f"Could not extract runtime info: {e}")
-            return None
+                    # Store runtime info in our data structure for potential future use
+                    flatpak_info.runtime_info = runtime_info
+                    appstream_runtime = self.get_runtime_from_flatpak_info(runtime_info)
+                
+                failed_arches = {arch for name, arch in failed_listings if name == flatpak_info.remote}
+                self._assign_runtimes(flatpak_info, listed[flatpak_id], appstream_runtime, failed_arches,
+                                      self._appstream_fingerprints.get(flatpak_id))
+                if flatpak_info.current_runtime:
+                    continue
+                if appstream_runtime or flatpak_id in bulk_hits:
+                    logger.info(f"{flatpak_id} is not published for {', '.join(self.arches)}, skipping")
+                else:
+                    logger.warning(f"Could not determine runtime for {flatpak_id}, skipping")
+        
+        if self._hedge_executor:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+            logger.info(f"Hedged {self.hedge_stats['hedged']} slow lookups, "
+                        f"{self.hedge_stats['hedge_wins']} answered by the hedge first")
+        if self.failed_lookups:
+            logger.warning(f"Lookups failed for {len(self.failed_lookups)} apps; they are reported as unchecked")
+        if len(self.unchecked) > len(self.failed_lookups) + backing_off:
+            logger.warning(f"Deadline reached: {len(self.unchecked) - len(self.failed_lookups) - backing_off} "
+                           f"apps were not checked")
+        
+        if self.checkpoint:
+            self.checkpoint.flush()
+        
+        return app_flatpaks
     
-    def get_available_runtime_versions(self, runtime_name: str) -> List[str]:
-        """Get available versions of a runtime from flathub using API and known current versions."""
-        
-        # Known current runtime versions as of 2024/2025
-        # These are updated periodically and represent the latest stable versions
-        # TODO: Update these versions when new stable releases are available
-        # - Check GNOME release schedule: https://wiki.gnome.org/ReleasePlanning
-        # - Check Freedesktop SDK releases: https://gitlab.com/freedesktop-sdk/freedesktop-sdk
-        # - Check KDE release schedule: https://community.kde.org/Schedules
-        known_latest_versions = {
-            'org.gnome.Platform': '49',  # GNOME 49 is current stable as of Oct 2025
-            'org.freedesktop.Platform': '25.08',  # Freedesktop 25.08 is current
-            'org.kde.Platform': '6.10',  # KDE 6.9 is current
-        }
+    def _assign_runtimes(self, flatpak_info: FlatpakInfo, listed: Dict[str, str],
+                         appstream_runtime: Optional[str], failed_arches: Set[str],
+                         appstream_fingerprint: Optional[str] = None):
+        """Fill in the runtime of an app for every checked arch, with the fingerprint of its source.
         
-        # First, try to use the known latest version for common runtimes
-        if runtime_name in known_latest_versions:
-            latest_version = known_latest_versions[runtime_name]
-            logger.info(f"Using known latest version {latest_version} for runtime {runtime_name}")
-            return [latest_version]
+        Listings are authoritative: an app missing from a listing that loaded is
+        not published for that arch. The appstream runtime covers x86_64, and
+        stands in for arches whose listing could not be loaded. Runtimes read
+        from a listing or a checkpoint are fingerprinted by the runtime ref itself.
+        """
+        for arch in self.arches:
+            if arch in listed:
+                flatpak_info.runtimes[arch] = listed[arch]
+                flatpak_info.fingerprints[arch] = self.fingerprint(listed[arch])
+            elif appstream_runtime and arch == APPSTREAM_ARCH:
+                flatpak_info.runtimes[arch] = appstream_runtime
+                flatpak_info.fingerprints[arch] = appstream_fingerprint or self.fingerprint(appstream_runtime)
+            elif appstream_runtime and arch in failed_arches:
+                flatpak_info.runtimes[arch] = arch_runtime(appstream_runtime, arch)
+                flatpak_info.fingerprints[arch] = (appstream_fingerprint
+                                                   or self.fingerprint(flatpak_info.runtimes[arch]))
+            else:
+                logger.debug(f"{flatpak_info.flatpak_id} is not published for {arch}")
+        flatpak_info.current_runtime = next(iter(flatpak_info.runtimes.values()), None)
+    
+    def _carried_forward(self, flatpak_info: FlatpakInfo, previous_state: Dict[str, Dict],
+                         history: Dict, now: float) -> List[Dict]:
+        """Outdated entries of an app deferred by the scheduler, rebuilt from its last check.
         
-        # Fallback: try to get runtime information from Flathub API
+        Only the runtime fetched at the last check is carried forward; it is
+        compared again with the current latest branch, which may have moved.
+        """
+        age = int(now - history['last_checked'])
+        packages = []
+        for arch in self.arches:
+            previous = previous_state.get(state_key(flatpak_info.flatpak_id, arch))
+            if not previous or not previous.get('runtime'):
+                continue
+            current_runtime = previous['runtime']
+            current_version = current_runtime.split('/')[-1]
+            available_versions = self.get_available_runtime_versions(current_runtime.split('/')[0], arch)
+            if available_versions:
+                latest_version = max(available_versions)
+                is_outdated = self.compare_versions(current_version, latest_version)
+            else:
+                latest_version = previous.get('latest_version')
+                is_outdated = previous.get('outdated')
+            if not is_outdated:
+                continue
+            packages.append({
+                "flatpak_id": flatpak_info.flatpak_id,
+                "arch": arch,
+                "remote": flatpak_info.remote,
+                "sources": flatpak_info.sources,
+                "current_runtime": current_runtime,
+                "latest_runtime": current_runtime.replace(current_version, latest_version),
+                "current_version": current_version,
+                "latest_version": latest_version,
+                "age": age
+            })
+        return packages
+    
+    def _checkpoint_lookup(self, flatpak_id: str, future):
+        """Record a finished appstream lookup in the checkpoint."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        runtime_info = future.result()
+        if runtime_info:
+            self.checkpoint.record(flatpak_id, self.get_runtime_from_flatpak_info(runtime_info))
+    
+    def get_runtime_from_flatpak_info(self, flatpak_info: AppMetadata) -> Optional[str]:
+        """Extract runtime information from flatpak metadata.
+        
+        Looks for the runtime in the bundle information first, then in the
+        metadata section.
+        """
+        return flatpak_info.runtime
+    
+    def get_available_runtime_versions(self, runtime_name: str, arch: Optional[str] = None) -> List[str]:
+        """Get the latest available version of a runtime from the runtime catalog of an arch."""
+        catalog = self.runtime_catalogs[arch] if arch else self.runtime_catalog
+        latest_version = catalog.latest_branch(runtime_name)
+        return [latest_version] if latest_version else []
+    
+    def get_runtime_version_from_api(self, runtime_name: str) -> Optional[str]:
+        """Fallback: try to get runtime version information from the Flathub API."""
         try:
             api_url = f"https://flathub.org/api/v2/appstream/{runtime_name}"
-            response = requests.get(api_url, timeout=30)
+            response = self._get(api_url)
             if response.status_code == 200:
-                runtime_info = response.json()
-                # Try to extract version information from the API response
-                if 'bundle' in runtime_info and 'runtime' in runtime_info['bundle']:
-                    runtime_ref = runtime_info['bundle']['runtime']
-                    # Extract version from runtime reference (e.g., "org.gnome.Platform/x86_64/47" -> "47")
-                    if '/' in runtime_ref:
-                        version = runtime_ref.split('/')[-1]
-                        return [version]
-        except requests.RequestException as e:
+                runtime_ref = AppMetadata.from_json(response.text).bundle_runtime
+                # Extract version from runtime reference (e.g., "org.gnome.Platform/x86_64/47" -> "47")
+                if runtime_ref and '/' in runtime_ref:
+                    return runtime_ref.split('/')[-1]
+        except (requests.RequestException, ValueError) as e:
             logger.debug(f"Could not fetch runtime info from API for {runtime_name}: {e}")
-        
-        # Final fallback: try flatpak command (kept for environments where it might work)
-        try:
-            cmd = ['flatpak', 'remote-ls', '--runtime', 'flathub', '--columns=name,version', runtime_name]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0:
-                versions = []
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        parts = line.split('\t')
-                        if len(parts) >= 2 and parts[0].strip() == runtime_name:
-                            versions.append(parts[1].strip())
-                if versions:
-                    return versions
-                    
-        except Exception as e:
-            logger.debug(f"Flatpak command failed for {runtime_name}: {e}")
-            
-        logger.warning(f"Could not determine latest version for runtime {runtime_name}")
-        return []
+        return None
     
     def compare_versions(self, current: str, latest: str) -> bool:
         """Compare version strings to determine if current is outdated."""
@@ -300,23 +1152,192 @@ class FlatpakRuntimeChecker:
             # If we can't parse versions, assume string comparison
             return current != latest
     
+    def fingerprint(self, data: Optional[str]) -> str:
+        """Hash of the appstream document or listing entry an app's runtime was read from."""
+        return hashlib.sha256((data or '').encode('utf-8')).hexdigest()[:16]
+    
+    def _load_state_file(self) -> Dict:
+        # Without a state file, state only lives for the lifetime of the checker
+        if not self.state_file:
+            return self._state_data
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _load_state(self) -> Dict[str, Dict]:
+        """Load per-app fingerprints and verdicts from the previous run."""
+        return self._load_state_file().get('apps', {})
+    
+    def _load_schedule(self) -> Dict[str, Dict]:
+        """Load per-app last check times and runtime change history."""
+        return self._load_state_file().get('schedule', {})
+    
+    def _save_state(self, state: Dict[str, Dict], schedule: Dict[str, Dict], tracked: Dict[str, FlatpakInfo]):
+        """Persist per-app fingerprints, verdicts, check history and ingested source lists for the next run.
+        
+        The state file is re-read just before writing, so entries that shards
+        running concurrently saved for their own apps are kept rather than
+        overwritten with the stale copies this run started from.
+        """
+        current = self._load_state_file()
+        state = dict(state)
+        schedule = dict(schedule)
+        for key, entry in current.get('apps', {}).items():
+            fid = key.split('@')[0]
+            if fid in tracked and not self.in_shard(fid):
+                state[key] = entry
+        for fid, entry in current.get('schedule', {}).items():
+            if fid in tracked and not self.in_shard(fid):
+                schedule[fid] = entry
+        
+        # A source that could not be fetched keeps the list it was last ingested with
+        sources = dict(current.get('sources', {}))
+        sources.update({name: apps for name, apps in self._fetched.items() if apps is not None})
+        self._state_data = {'apps': state, 'schedule': schedule, 'sources': sources}
+        if not self.state_file:
+            return
+        # Write to a temporary file first so a concurrent reader never sees a truncated state
+        tmp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state_data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not save check state: {e}")
+    
+    def _merge_previous_output(self, outdated_packages: List[Dict], app_flatpaks: Dict[str, FlatpakInfo],
+                               state: Dict[str, Dict]) -> List[Dict]:
+        """Combine a targeted recheck with the untouched entries of the previous output.
+        
+        Entries of apps no longer tracked are dropped, and the sources of the
+        rest are updated to the new source membership. Apps outside the focus
+        that were unchecked or carried forward in the previous output stay so.
+        """
+        try:
+            with open(self.output_file, 'r') as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            previous = {}
+        
+        kept = [dict(package, sources=app_flatpaks[package['flatpak_id']].sources)
+                for package in previous.get('outdated_packages', [])
+                if package['flatpak_id'] in app_flatpaks and package['flatpak_id'] not in self.focus]
+        previous_tracked = previous.get('all_tracked_packages', [])
+        previous_unchecked = set(previous.get('unchecked_packages', []))
+        self.unchecked.update(fid for fid in previous_unchecked if fid in app_flatpaks and fid not in self.focus)
+        self._carried_forward_count += previous.get('carried_forward', 0)
+        # Unchecked apps were never part of the previous total_checked
+        stale = [fid for fid in previous_tracked
+                 if (fid not in app_flatpaks or fid in self.focus) and fid not in previous_unchecked]
+        self._total_checked += max(0, previous.get('total_checked', 0) - len(stale))
+        
+        order = {fid: position for position, fid in enumerate(app_flatpaks)}
+        merged = sorted(kept + outdated_packages, key=lambda package: order[package['flatpak_id']])
+        for arch, counts in self._arch_counts.items():
+            counts['checked'] = sum(1 for fid in app_flatpaks if state_key(fid, arch) in state)
+            counts['outdated_count'] = sum(1 for package in merged if package.get('arch', APPSTREAM_ARCH) == arch)
+        return merged
+    
+    def recheck_sources(self, new_lists: Dict[str, List[str]]) -> bool:
+        """Check only the apps added to the given sources since they were last ingested.
+        
+        Every other source keeps the list it was last ingested with, so apps
+        removed from a source just lose that source, and apps in no source any
+        more stop being tracked; no other app is looked up again. The previous
+        output file is updated in place. Returns False if there is no earlier
+        ingest to diff against.
+        """
+        ingested = self._load_state_file().get('sources', {})
+        missing = [name for name in SOURCES if name not in ingested and name not in new_lists]
+        if missing:
+            logger.error(f"No ingested list for {', '.join(missing)}; run a full check first")
+            return False
+        
+        added = set()
+        for source_name, new_list in new_lists.items():
+            old_list = set(ingested.get(source_name, []))
+            source_added = [fid for fid in dict.fromkeys(new_list) if fid not in old_list]
+            source_removed = old_list - set(new_list)
+            logger.info(f"{source_name}: {len(source_added)} apps added, {len(source_removed)} removed "
+                        f"since it was last ingested")
+            added.update(source_added)
+        
+        if not added and all(set(new_list) == set(ingested.get(name, [])) for name, new_list in new_lists.items()):
+            logger.info("Source lists are unchanged, nothing to recheck")
+            return True
+        
+        self.source_overrides = {**ingested, **new_lists}
+        self.focus = added
+        # A recheck must not clear the checkpoint of an interrupted full run
+        self.checkpoint = None
+        self.check_runtime_updates()
+        return True
+    
+    def app_statuses(self, app_flatpaks: Dict[str, FlatpakInfo], state: Dict[str, Dict],
+                     schedule: Dict[str, Dict]) -> Dict[str, Dict]:
+        """Per-app status after a run: how the app was handled and its verdict per arch."""
+        statuses = {}
+        for flatpak_id, flatpak_info in app_flatpaks.items():
+            if not self.in_shard(flatpak_id):
+                status = 'other_shard'
+            elif flatpak_id in self.unchecked:
+                status = 'unchecked'
+            elif flatpak_id in self.deferred:
+                status = 'carried_forward'
+            elif not flatpak_info.runtimes:
+                status = 'unresolved'
+            else:
+                status = 'checked'
+            
+            arches = {}
+            for arch in self.arches:
+                entry = state.get(state_key(flatpak_id, arch))
+                if entry:
+                    arches[arch] = {'runtime': entry.get('runtime'), 'latest_version': entry.get('latest_version'),
+                                    'outdated': entry.get('outdated')}
+            last_checked = schedule.get(flatpak_id, {}).get('last_checked')
+            statuses[flatpak_id] = {
+                'status': status,
+                'sources': flatpak_info.sources,
+                'remote': flatpak_info.remote,
+                'arches': arches,
+                'last_checked': datetime.fromtimestamp(last_checked).isoformat()
+                                if last_checked else None
+            }
+        return statuses
+    
     def save_outdated_packages(self, outdated_packages: List[Dict], all_tracked_flatpaks: Dict[str, any]):
         """Save outdated packages to JSON file for issue generation."""
         # Convert all tracked flatpaks to a list for easier processing
         all_tracked_list = list(all_tracked_flatpaks.keys())
+        # Apps, not (app, arch) entries; per-arch counts are in "arches"
+        outdated_count = len({package['flatpak_id'] for package in outdated_packages})
         
         output_data = {
-            "timestamp": __import__('datetime').datetime.now().isoformat(),
+            "timestamp": datetime.now().isoformat(),
             "total_checked": getattr(self, '_total_checked', 0),
-            "outdated_count": len(outdated_packages),
+            "outdated_count": outdated_count,
             "outdated_packages": outdated_packages,
-            "all_tracked_packages": all_tracked_list
+            "all_tracked_packages": all_tracked_list,
+            "evaluation": getattr(self, '_evaluation', {}),
+            "arches": getattr(self, '_arch_counts', {})
         }
+        if self.budget is not None or getattr(self, '_carried_forward_count', 0):
+            # Apps not due this run: their outdated entries carry an "age" in seconds
+            output_data["carried_forward"] = getattr(self, '_carried_forward_count', 0)
+        if self.shard:
+            output_data["shard"] = f"{self.shard[0]}/{self.shard[1]}"
+        if self.deadline is not None or self.unchecked:
+            # Not checked before the deadline or lookup failed: neither outdated nor up to date
+            output_data["unchecked_packages"] = [fid for fid in all_tracked_list if fid in self.unchecked]
         
         try:
             with open(self.output_file, 'w') as f:
                 json.dump(output_data, f, indent=2)
-            logger.info(f"Saved {len(outdated_packages)} outdated packages to {self.output_file}")
+            logger.info(f"Saved {outdated_count} outdated packages to {self.output_file}")
             logger.info(f"Total tracked packages: {len(all_tracked_list)}")
         except Exception as e:
             logger.error(f"Failed to save outdated packages: {e}")
@@ -325,77 +1346,303 @@ class FlatpakRuntimeChecker:
     def check_runtime_updates(self):
         """Main method to check for runtime updates and save outdated packages to JSON."""
         logger.info("Starting flatpak runtime update check")
+        self.unchecked = set()
+        self.failed_lookups = set()
+        self.deferred = set()
+        self._previous_state = self._load_state()
+        self._appstream_fingerprints = {}
+        self.unparsed = 0
+        for catalog in self.runtime_catalogs.values():
+            catalog.reset()
+        if self.deadline is not None:
+            self._deadline_at = time.monotonic() + self.deadline
         
-        # Fetch flatpak dictionary from multiple sources
-        flatpak_dict = self.fetch_flatpak_list()
-        app_flatpaks = self.get_app_flatpaks(flatpak_dict)
+        # Fetch flatpaks from multiple sources and resolve their runtimes
+        app_flatpaks = self.collect_app_runtimes()
         
-        logger.info(f"Checking {len(app_flatpaks)} unique app flatpaks for runtime updates")
-        self._total_checked = len(app_flatpaks)
+        shard_flatpaks = {fid: info for fid, info in app_flatpaks.items() if self.in_shard(fid)}
+        if self.shard:
+            logger.info(f"Shard {self.shard[0]}/{self.shard[1]}: checking {len(shard_flatpaks)} "
+                        f"of {len(app_flatpaks)} unique app flatpaks")
+        
+        logger.info(f"Checking {len(shard_flatpaks)} unique app flatpaks for runtime updates")
         
         outdated_packages = []
+        arch_counts = {arch: {'checked': 0, 'outdated_count': 0} for arch in self.arches}
         
-        for flatpak_id, flatpak_info in app_flatpaks.items():
-            logger.info(f"Checking {flatpak_id} (from: {', '.join(flatpak_info.sources)})")
-            
-            # Get flatpak information
-            runtime_info = self.get_flatpak_info(flatpak_id)
-            if not runtime_info:
-                logger.warning(f"Could not get info for {flatpak_id}, skipping")
+        # Resolve the latest branch of every runtime in use once per arch, all arches at once
+        runtime_names = {arch: set() for arch in self.arches}
+        for flatpak_id, info in shard_flatpaks.items():
+            for arch, runtime in info.runtimes.items():
+                runtime_names[arch].add(runtime.split('/')[0])
+            # Deferred apps are compared again using the runtime stored at their last check
+            if flatpak_id in self.deferred:
+                for arch in self.arches:
+                    previous = self._previous_state.get(state_key(flatpak_id, arch), {})
+                    if previous.get('runtime'):
+                        runtime_names[arch].add(previous['runtime'].split('/')[0])
+        with ThreadPoolExecutor(max_workers=len(self.arches)) as executor:
+            list(executor.map(lambda arch: self.runtime_catalogs[arch].resolve(runtime_names[arch]), self.arches))
+        
+        # Without any latest branch every app would look up to date, closing all of their issues
+        if any(runtime_names.values()) and not any(
+                self.get_available_runtime_versions(name, arch) for arch in self.arches for name in runtime_names[arch]):
+            raise CatalogUnavailable(f"no latest branch could be resolved for any of the "
+                                     f"{sum(len(names) for names in runtime_names.values())} runtimes in use")
+        
+        # Keep the previous state of tracked apps that belong to other shards or were not checked
+        previous_state = self._previous_state
+        state = {}
+        for key, entry in previous_state.items():
+            fid = key.split('@')[0]
+            if fid in app_flatpaks and (fid not in shard_flatpaks or fid in self.unchecked or fid in self.deferred):
+                state[key] = entry
+        schedule = {fid: entry for fid, entry in self._load_schedule().items() if fid in app_flatpaks}
+        now = time.time()
+        reused = 0
+        recomputed = 0
+        carried = 0
+        
+        for flatpak_id, flatpak_info in shard_flatpaks.items():
+            if flatpak_id in self.unchecked:
                 continue
-            
-            # Store runtime info in our data structure for potential future use
-            flatpak_info.runtime_info = runtime_info
-            
-            # Extract runtime information
-            current_runtime = self.get_runtime_from_flatpak_info(runtime_info)
-            if not current_runtime:
-                logger.warning(f"Could not determine runtime for {flatpak_id}, skipping")
+            if flatpak_id in self.deferred:
+                carried_packages = self._carried_forward(flatpak_info, previous_state, schedule[flatpak_id], now)
+                outdated_packages.extend(carried_packages)
+                carried += 1
                 continue
+            logger.info(f"Checking {flatpak_id} (from: {', '.join(flatpak_info.sources)})")
+            changed = False
             
-            # Store current runtime info
-            flatpak_info.current_runtime = current_runtime
-            
-            logger.info(f"{flatpak_id} uses runtime: {current_runtime}")
-            
-            # Get available runtime versions
-            runtime_name = current_runtime.split('/')[0] if '/' in current_runtime else current_runtime
-            available_versions = self.get_available_runtime_versions(runtime_name)
-            
-            if not available_versions:
-                logger.warning(f"Could not get available versions for runtime {runtime_name}")
+            # An app whose runtime has no known latest branch is unchecked, not up to date
+            unresolved = [arch for arch, runtime in flatpak_info.runtimes.items()
+                          if not self.get_available_runtime_versions(runtime.split('/')[0], arch)]
+            if unresolved:
+                logger.warning(f"Could not get available versions for the runtime of {flatpak_id} on "
+                               f"{', '.join(unresolved)}, leaving it unchecked")
+                self.unchecked.add(flatpak_id)
+                state.update({key: entry for key, entry in previous_state.items()
+                              if key.split('@')[0] == flatpak_id})
                 continue
             
-            # Find the latest version
-            latest_version = max(available_versions) if available_versions else None
-            if not latest_version:
-                continue
+            for arch, current_runtime in flatpak_info.runtimes.items():
+                logger.info(f"{flatpak_id} uses runtime: {current_runtime}")
                 
-            # Extract current version for comparison
-            current_version = current_runtime.split('/')[-1] if '/' in current_runtime else current_runtime
-            
-            # Compare versions
-            if self.compare_versions(current_version, latest_version):
-                logger.info(f"Runtime update available for {flatpak_id}: {current_version} -> {latest_version}")
-                latest_runtime = current_runtime.replace(current_version, latest_version)
+                # Get available runtime versions
+                runtime_name = current_runtime.split('/')[0] if '/' in current_runtime else current_runtime
+                available_versions = self.get_available_runtime_versions(runtime_name, arch)
                 
-                # Add to outdated packages list
-                outdated_package = {
-                    "flatpak_id": flatpak_id,
-                    "sources": flatpak_info.sources,
-                    "current_runtime": current_runtime,
-                    "latest_runtime": latest_runtime,
-                    "current_version": current_version,
-                    "latest_version": latest_version
-                }
-                outdated_packages.append(outdated_package)
-            else:
-                logger.info(f"{flatpak_id} runtime is up to date")
+                # Find the latest version
+                latest_version = max(available_versions) if available_versions else None
+                if not latest_version:
+                    continue
+                    
+                # Extract current version for comparison
+                current_version = current_runtime.split('/')[-1] if '/' in current_runtime else current_runtime
+                
+                # Carry the previous verdict forward if neither the app's source data nor its target branch changed
+                key = state_key(flatpak_id, arch)
+                fingerprint = flatpak_info.fingerprints.get(arch) or self.fingerprint(current_runtime)
+                previous = previous_state.get(key)
+                if previous and previous.get('fingerprint') == fingerprint and previous.get('latest_version') == latest_version:
+                    is_outdated = previous['outdated']
+                    reused += 1
+                else:
+                    is_outdated = self.compare_versions(current_version, latest_version)
+                    recomputed += 1
+                changed = changed or bool(previous and previous.get('runtime') != current_runtime)
+                state[key] = {'fingerprint': fingerprint, 'latest_version': latest_version, 'outdated': is_outdated,
+                              'runtime': current_runtime}
+                arch_counts[arch]['checked'] += 1
+                
+                # Compare versions
+                if is_outdated:
+                    logger.info(f"Runtime update available for {flatpak_id} on {arch}: "
+                                f"{current_version} -> {latest_version}")
+                    latest_runtime = current_runtime.replace(current_version, latest_version)
+                    
+                    # Add to outdated packages list
+                    outdated_package = {
+                        "flatpak_id": flatpak_id,
+                        "arch": arch,
+                        "remote": flatpak_info.remote,
+                        "sources": flatpak_info.sources,
+                        "current_runtime": current_runtime,
+                        "latest_runtime": latest_runtime,
+                        "current_version": current_version,
+                        "latest_version": latest_version
+                    }
+                    outdated_packages.append(outdated_package)
+                    arch_counts[arch]['outdated_count'] += 1
+                else:
+                    logger.info(f"{flatpak_id} runtime is up to date on {arch}")
+            
+            # Record the check for the scheduler, with the time of any runtime change
+            changes = schedule.get(flatpak_id, {}).get('changes', [])
+            if changed:
+                changes = (changes + [now])[-CHANGE_HISTORY:]
+            schedule[flatpak_id] = {'last_checked': now, 'changes': changes}
         
+        # Count consecutive failures so the scheduler backs off instead of retrying every run
+        for flatpak_id in self.failed_lookups:
+            entry = schedule.get(flatpak_id, {})
+            schedule[flatpak_id] = dict(entry, failures=entry.get('failures', 0) + 1, last_failed=now)
+        
+        self._total_checked = len(shard_flatpaks) - len(self.unchecked) - len(self.deferred)
         logger.info(f"Runtime check complete. Found {len(outdated_packages)} outdated runtimes")
+        logger.info(f"Reused {reused} unchanged verdicts from the previous run, recomputed {recomputed}; "
+                    f"{self.unparsed} unchanged appstream documents were not parsed again")
+        self._evaluation = {'reused': reused, 'recomputed': recomputed, 'unparsed': self.unparsed}
+        self._arch_counts = arch_counts
+        self._carried_forward_count = carried
+        if self.deferred:
+            logger.info(f"Carried forward the verdicts of {carried} apps not due for a check")
+        self._save_state(state, schedule, app_flatpaks)
+        
+        if self.source_cache:
+            self.source_cache.log_summary()
+        self.source_session.log_summary()
+        for backend in self.remotes.values():
+            backend.log_summary()
+        if self.snapshot:
+            self.snapshot.log_summary()
+        
+        if self.focus is not None:
+            outdated_packages = self._merge_previous_output(outdated_packages, app_flatpaks, state)
         
         # Save outdated packages to JSON file
         self.save_outdated_packages(outdated_packages, app_flatpaks)
+        self.results = {
+            'timestamp': datetime.now().isoformat(),
+            'total_checked': self._total_checked,
+            'outdated_packages': outdated_packages,
+            'apps': self.app_statuses(app_flatpaks, state, schedule)
+        }
+        
+        # The output now records every unchecked app; only an interrupted run leaves its checkpoint behind
+        if self.checkpoint:
+            self.checkpoint.clear()
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a shard specification of the form "i/N" (1 <= i <= N)."""
+    import argparse
+    
+    match = re.fullmatch(r'(\d+)/(\d+)', value.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected i/N")
+    index, count = int(match.group(1)), int(match.group(2))
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"invalid shard '{value}', expected 1 <= i <= N")
+    return index, count
+
+
+def sources_from_event(payload: Dict) -> Dict[str, bool]:
+    """Tracked sources touched by a GitHub push event payload, mapped to whether the file was removed."""
+    repository = (payload.get('repository') or {}).get('full_name', '')
+    branch = payload.get('ref', '').replace('refs/heads/', '')
+    prefix = f"https://raw.githubusercontent.com/{repository}/{branch}/"
+    touched = {}
+    for commit in payload.get('commits') or [payload.get('head_commit') or {}]:
+        for kind in ('added', 'modified', 'removed'):
+            for path in commit.get(kind) or []:
+                for source_name, source_config in SOURCES.items():
+                    if source_config['url'] == prefix + path:
+                        touched[source_name] = kind == 'removed'
+    return touched
+
+
+def load_event(checker: FlatpakRuntimeChecker, location: str) -> Dict:
+    """Read a push event payload from a file, or from a URL such as a local stub server."""
+    if location.startswith(('http://', 'https://')):
+        response = checker.source_session.get(location, timeout=SOURCE_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    with open(location, 'r') as f:
+        return json.load(f)
+
+
+def parse_arches(value: str) -> List[str]:
+    """Parse a comma-separated list of arches (e.g. "x86_64,aarch64")."""
+    import argparse
+    
+    arches = [arch.strip() for arch in value.split(',') if arch.strip()]
+    if not arches or not all(re.fullmatch(r'[A-Za-z0-9_]+', arch) for arch in arches):
+        raise argparse.ArgumentTypeError(f"invalid arch list '{value}'")
+    return arches
+
+
+def merge_shard_outputs(input_files: List[str], output_file: str):
+    """Combine the outputs of sharded runs into a single outdated_packages.json."""
+    all_tracked = {}
+    outdated = {}
+    total_checked = 0
+    evaluation = {'reused': 0, 'recomputed': 0, 'unparsed': 0}
+    shards = []
+    unchecked = None
+    carried = None
+    arch_counts = {}
+    
+    for input_file in input_files:
+        try:
+            with open(input_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read shard output {input_file}: {e}")
+            sys.exit(1)
+        
+        shards.append(data.get('shard'))
+        total_checked += data.get('total_checked', 0)
+        for key in evaluation:
+            evaluation[key] += data.get('evaluation', {}).get(key, 0)
+        for flatpak_id in data.get('all_tracked_packages', []):
+            all_tracked.setdefault(flatpak_id, len(all_tracked))
+        for package in data.get('outdated_packages', []):
+            outdated.setdefault((package['flatpak_id'], package.get('arch', APPSTREAM_ARCH)), package)
+        for arch, counts in data.get('arches', {}).items():
+            merged = arch_counts.setdefault(arch, {'checked': 0, 'outdated_count': 0})
+            for key in merged:
+                merged[key] += counts.get(key, 0)
+        if 'unchecked_packages' in data:
+            unchecked = (unchecked or set()) | set(data['unchecked_packages'])
+        if 'carried_forward' in data:
+            carried = (carried or 0) + data['carried_forward']
+    
+    # Sanity check that every shard of one partitioning is present exactly once
+    counts = set(shard.split('/')[1] for shard in shards if shard)
+    if len(counts) > 1:
+        logger.warning(f"Merging shards from different partitionings: {', '.join(sorted(counts))}")
+    elif counts:
+        expected = int(counts.pop())
+        present = [shard for shard in shards if shard]
+        if len(present) != expected or len(set(present)) != expected:
+            logger.warning(f"Expected {expected} distinct shards, got: {', '.join(present)}")
+    
+    # Order outdated packages like an unsharded run would
+    outdated_packages = sorted(outdated.values(), key=lambda p: all_tracked.get(p['flatpak_id'], len(all_tracked)))
+    
+    output_data = {
+        "timestamp": datetime.now().isoformat(),
+        "total_checked": total_checked,
+        "outdated_count": len({package['flatpak_id'] for package in outdated_packages}),
+        "outdated_packages": outdated_packages,
+        "all_tracked_packages": list(all_tracked),
+        "evaluation": evaluation,
+        "arches": arch_counts
+    }
+    if unchecked is not None:
+        output_data["unchecked_packages"] = [fid for fid in all_tracked if fid in unchecked]
+    if carried is not None:
+        output_data["carried_forward"] = carried
+    
+    try:
+        with open(output_file, 'w') as f:
+            json.dump(output_data, f, indent=2)
+        logger.info(f"Merged {len(input_files)} shard outputs into {output_file}: "
+                    f"{total_checked} checked, {output_data['outdated_count']} outdated")
+    except Exception as e:
+        logger.error(f"Failed to save merged output: {e}")
+        sys.exit(1)
 
 
 def main():
@@ -403,12 +1650,160 @@ def main():
     import argparse
     
     parser = argparse.ArgumentParser(description='Check for flatpak runtime updates')
+    subparsers = parser.add_subparsers(dest='command')
+    merge_parser = subparsers.add_parser('merge', help='Merge the outputs of sharded runs')
+    merge_parser.add_argument('inputs', nargs='+', help='Shard output JSON files')
+    merge_parser.add_argument('--output', '-o', default='outdated_packages.json',
+                              help='Merged output JSON file (default: outdated_packages.json)')
+    
     parser.add_argument('--output', '-o', default='outdated_packages.json',
                        help='Output JSON file for outdated packages (default: outdated_packages.json)')
+    parser.add_argument('--shard', type=parse_shard,
+                       help='Only check shard i of N (e.g. 2/4) of the deduplicated app set; '
+                            'combine the outputs with the merge command')
+    parser.add_argument('--arch', type=parse_arches, action='append', dest='arches', metavar='ARCH[,ARCH...]',
+                       help=f'Architecture to check; repeat or separate with commas to check several '
+                            f'in one run (default: {APPSTREAM_ARCH})')
+    parser.add_argument('--workers', '-w', type=int, default=DEFAULT_WORKERS,
+                       help=f'Maximum concurrent Flathub lookups; the actual number adapts to Flathub health (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Resolve app runtimes from one listing of the whole remote, '
+                            'falling back to appstream lookups only for misses')
+    parser.add_argument('--summary-file',
+                       help='Saved "flatpak remote-ls --columns=ref,runtime" output to use for --bulk '
+                            'instead of listing the remote (implies --bulk); may contain {arch} '
+                            'to read one file per arch')
+    parser.add_argument('--remotes', metavar='FILE',
+                       help='YAML file declaring extra flatpak remotes (e.g. flathub-beta) and which apps come '
+                            'from them; apps not listed there are resolved from flathub')
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                       help='Stop looking up apps after this many seconds, checking the most important apps first; '
+                            'apps left over are listed as unchecked in the output')
+    parser.add_argument('--budget', type=int, default=None, metavar='LOOKUPS',
+                       help='Look up at most this many apps per run, picking the stalest, most often changing and '
+                            'most popular; the others carry their previous verdict forward')
+    parser.add_argument('--max-check-age', type=int, default=DEFAULT_MAX_CHECK_AGE, metavar='SECONDS',
+                       help=f'With --budget, apps not checked for this long are always checked '
+                            f'(default: {DEFAULT_MAX_CHECK_AGE})')
+    parser.add_argument('--resume', action='store_true',
+                       help='Resume an interrupted run, skipping apps already checked within --resume-max-age')
+    parser.add_argument('--resume-max-age', type=int, default=DEFAULT_RESUME_MAX_AGE,
+                       help=f'Seconds a checkpointed result stays valid for --resume (default: {DEFAULT_RESUME_MAX_AGE})')
+    parser.add_argument('--recheck', choices=list(SOURCES), metavar='SOURCE',
+                       help='Only check the apps added to SOURCE since it was last ingested and update the '
+                            'previous output for apps removed from it')
+    parser.add_argument('--source-file',
+                       help='New content of the --recheck source, instead of fetching it')
+    parser.add_argument('--event', metavar='FILE|URL',
+                       help='GitHub push event payload; rechecks every tracked source list it touches')
+    parser.add_argument('--watch', type=float, nargs='?', const=DEFAULT_INTERVAL, default=None, metavar='SECONDS',
+                       help=f'Keep running, re-checking every SECONDS (default: {DEFAULT_INTERVAL}) and serving '
+                            f'the results over HTTP/JSON at --listen')
+    parser.add_argument('--listen', default=DEFAULT_LISTEN, metavar='HOST:PORT',
+                       help=f'Address of the --watch query endpoint (default: {DEFAULT_LISTEN})')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help=f'Directory for the persistent HTTP response cache (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-ttl', type=int, default=DEFAULT_TTL,
+                       help=f'Seconds before cached responses are revalidated (default: {DEFAULT_TTL})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Disable the HTTP response cache')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--offline', metavar='DIR',
+                                help='Read every input from the snapshot in DIR and make no network calls '
+                                     '(implies --no-cache)')
+    snapshot_group.add_argument('--record-snapshot', metavar='DIR',
+                                help='Record every input of this run into DIR for --offline (implies --no-cache)')
     args = parser.parse_args()
     
-    checker = FlatpakRuntimeChecker(output_file=args.output)
-    checker.check_runtime_updates()
+    if args.command == 'merge':
+        merge_shard_outputs(args.inputs, args.output)
+        return
+    
+    snapshot = None
+    if args.offline or args.record_snapshot:
+        # Cached responses and check state would hide inputs from the snapshot
+        snapshot = Snapshot(args.offline or args.record_snapshot, record=bool(args.record_snapshot))
+        args.no_cache = True
+    cache = None
+    source_cache = None
+    catalog_file = None
+    state_file = None
+    checkpoint_file = None
+    stats_cache = None
+    if not args.no_cache:
+        catalog_file = os.path.join(args.cache_dir, 'runtime_catalog.json')
+        state_file = os.path.join(args.cache_dir, 'check_state.json')
+        shard_suffix = f"-{args.shard[0]}-of-{args.shard[1]}" if args.shard else ""
+        checkpoint_file = os.path.join(args.cache_dir, f"checkpoint{shard_suffix}.json")
+        cache = ResponseCache(args.cache_dir, namespace='flathub', ttl=args.cache_ttl)
+        # Source lists are always revalidated; the cached copy is the last known good fallback
+        source_cache = ResponseCache(args.cache_dir, namespace='sources', ttl=0)
+        # Download stats stored by issue_generator, used to order --deadline and --budget runs
+        stats_cache = ResponseCache(args.cache_dir, namespace='stats')
+    else:
+        if args.resume:
+            logger.warning("--resume has no effect with --no-cache")
+        if args.budget is not None:
+            logger.warning("--budget checks every app with --no-cache, as there is no check history")
+    remotes, app_remotes = None, None
+    if args.remotes:
+        try:
+            remotes, app_remotes = load_remotes(args.remotes, None if args.no_cache else args.cache_dir,
+                                                args.cache_ttl, snapshot=snapshot)
+        except ValueError as e:
+            logger.error(f"Invalid --remotes: {e}")
+            sys.exit(1)
+    checker = FlatpakRuntimeChecker(output_file=args.output, workers=args.workers,
+                                    cache=cache, source_cache=source_cache, catalog_file=catalog_file,
+                                    bulk=args.bulk, summary_file=args.summary_file, state_file=state_file,
+                                    shard=args.shard, checkpoint_file=checkpoint_file,
+                                    resume=args.resume, resume_max_age=args.resume_max_age,
+                                    deadline=args.deadline, stats_cache=stats_cache,
+                                    arches=[arch for group in args.arches or [] for arch in group],
+                                    remotes=remotes, app_remotes=app_remotes,
+                                    budget=args.budget, max_check_age=args.max_check_age,
+                                    snapshot=snapshot)
+    if args.recheck or args.event:
+        new_lists = {}
+        try:
+            if args.event:
+                for source_name, removed in sources_from_event(load_event(checker, args.event)).items():
+                    new_lists[source_name] = [] if removed else checker._fetch_source(source_name, SOURCES[source_name])
+                if not new_lists:
+                    logger.info("The event does not touch any tracked source list")
+            if args.recheck and args.source_file:
+                with open(args.source_file, 'r') as f:
+                    content = f.read()
+                new_lists[args.recheck] = checker._parse_source(content, SOURCES[args.recheck]['format'])
+            elif args.recheck:
+                new_lists[args.recheck] = checker._fetch_source(args.recheck, SOURCES[args.recheck])
+        except (OSError, ValueError, requests.RequestException) as e:
+            logger.error(f"Could not read the recheck input: {e}")
+            sys.exit(1)
+        failed = [name for name, apps in new_lists.items() if apps is None]
+        if failed:
+            logger.error(f"Could not fetch {', '.join(failed)}")
+            sys.exit(1)
+        try:
+            if new_lists and not checker.recheck_sources(new_lists):
+                sys.exit(1)
+        except CatalogUnavailable as e:
+            logger.error(f"Runtime catalog unavailable, not writing a result: {e}")
+            sys.exit(1)
+        return
+    if args.watch is not None:
+        try:
+            parse_listen(args.listen)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        run_watch(checker, interval=args.watch, listen=args.listen)
+        return
+    try:
+        checker.check_runtime_updates()
+    except CatalogUnavailable as e:
+        logger.error(f"Runtime catalog unavailable, not writing a result: {e}")
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Monthly download counts from the Flathub stats API, kept in a persistent store.
+Shared by issue_generator (popular labels) and generate_changelog (popular
+markers) and read by the runtime checker to order --deadline runs.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from http_cache import ResponseCache, DEFAULT_CACHE_DIR
+from http_client import RetryingSession, create_session
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on concurrent Flathub stats requests
+STATS_WORKERS = 8
+
+# Stats requests per second; lowered automatically while Flathub answers 429
+STATS_RATE_LIMIT = 20.0
+
+# Counts younger than this are used as-is; older ones are used and refreshed in the background
+DEFAULT_STATS_TTL = 24 * 60 * 60
+
+# Ranked popularity collection; each page carries install counts for many apps
+POPULAR_URL = 'https://flathub.org/api/v2/collection/popular'
+
+# Apps per collection page (the API maximum)
+POPULAR_PAGE_SIZE = 250
+
+# Collection pages read at most; apps ranked below them fall back to per-app stats
+POPULAR_MAX_PAGES = 20
+
+
+def stats_url(app_id: str) -> str:
+    """Flathub stats API URL of an app ID, with or without the 'app/' prefix."""
+    return f"https://flathub.org/api/v2/stats/{app_id.replace('app/', '')}"
+
+
+def create_stats_session() -> RetryingSession:
+    """Session for the stats API: bounded concurrency and a token-bucket rate limit."""
+    return create_session(pool_maxsize=STATS_WORKERS, max_concurrency=STATS_WORKERS, rate_limit=STATS_RATE_LIMIT)
+
+
+class DownloadStats:
+    """Monthly download counts by app ID, stored in the ``stats`` response cache namespace.
+
+    Counts younger than ``ttl`` are served from the store without a request.
+    Apps never fetched are fetched before returning; stale counts are
+    returned immediately and refreshed in the background for the next run.
+    With ``bulk``, missing and stale counts are first looked up in Flathub's
+    ranked popularity collection (or ``popular_file``, a saved copy of it),
+    so only apps outside it need a request of their own.
+    Without a session the store is read-only and makes no network calls.
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None, session: Optional[requests.Session] = None,
+                 ttl: int = DEFAULT_STATS_TTL, bulk: bool = False, popular_file: Optional[str] = None):
+        self.cache = cache
+        self.session = session
+        self.ttl = ttl
+        self.bulk = bulk or bool(popular_file)
+        self.popular_file = popular_file
+        self.counts = {'fresh': 0, 'stale': 0, 'bulk': 0, 'fetched': 0, 'unknown': 0}
+        self.popular_pages = 0
+        self._refresher: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def open(cls, cache_dir: str = DEFAULT_CACHE_DIR, ttl: int = DEFAULT_STATS_TTL,
+             offline: bool = False, **kwargs) -> 'DownloadStats':
+        """The shared on-disk store, fetching through a rate-limited session unless ``offline``."""
+        return cls(ResponseCache(cache_dir, namespace='stats', ttl=ttl),
+                   session=None if offline else create_stats_session(), ttl=ttl, **kwargs)
+
+    @staticmethod
+    def _parse(body: Optional[str]) -> Optional[int]:
+        try:
+            return int(json.loads(body).get('installs_last_month', 0)) if body else None
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+    def stored(self, app_id: str) -> Optional[int]:
+        """Stored count of an app regardless of age, or None if it was never fetched."""
+        return self._parse(self.cache.get_stale(stats_url(app_id))) if self.cache else None
+
+    def fetch(self, app_id: str, revalidate: bool = False) -> Optional[int]:
+        """Fetch an app's count from Flathub, storing it; None if the request fails."""
+        url = stats_url(app_id)
+        try:
+            if self.cache:
+                response = self.cache.get(self.session, url, timeout=30, ttl=0 if revalidate else None)
+            else:
+                response = self.session.get(url, timeout=30)
+        except requests.RequestException as e:
+            logger.warning(f"Could not fetch monthly download count for {app_id}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return self._parse(response.text)
+
+    def _popular_pages(self) -> Iterator[List[Dict]]:
+        """Hits of each page of the popularity collection, from ``popular_file`` or the API."""
+        if self.popular_file:
+            with open(self.popular_file, 'r') as f:
+                document = json.load(f)
+            # A saved collection page, a list of pages, or a bare list of hits
+            pages = document if isinstance(document, list) else [document]
+            if pages and isinstance(pages[0], dict) and 'app_id' in pages[0]:
+                pages = [{'hits': pages}]
+            for page in pages:
+                yield page.get('hits', [])
+            return
+        if self.session is None:
+            return
+        total_pages = 1
+        page = 1
+        while page <= min(total_pages, POPULAR_MAX_PAGES):
+            response = self.session.get(f"{POPULAR_URL}?page={page}&per_page={POPULAR_PAGE_SIZE}", timeout=30)
+            if response.status_code != 200:
+                logger.warning(f"Popular collection page {page} returned HTTP {response.status_code}")
+                return
+            document = response.json()
+            total_pages = int(document.get('totalPages') or 1)
+            yield document.get('hits', [])
+            page += 1
+
+    def load_popular(self, app_ids: List[str]) -> Dict[str, int]:
+        """Counts of ``app_ids`` found in the popularity collection, stored for later runs.
+
+        Paging stops once every wanted app has been found, so a run with only
+        popular apps reads a page or two.
+        """
+        wanted = {app_id.replace('app/', ''): app_id for app_id in app_ids}
+        found = {}
+        pages = 0
+        try:
+            for hits in self._popular_pages():
+                pages += 1
+                for hit in hits:
+                    app_id = wanted.pop(hit.get('app_id'), None)
+                    if app_id is None or hit.get('installs_last_month') is None:
+                        continue
+                    found[app_id] = int(hit['installs_last_month'])
+                    if self.cache:
+                        self.cache.put(stats_url(app_id), json.dumps({'installs_last_month': found[app_id]}))
+                if not wanted:
+                    break
+        except (OSError, ValueError, TypeError, AttributeError, requests.RequestException) as e:
+            logger.warning(f"Could not read the popular collection: {e}")
+        self.popular_pages += pages
+        logger.info(f"Popular collection covered {len(found)} of {len(app_ids)} apps "
+                    f"in {pages} page{'s' if pages != 1 else ''}")
+        return found
+
+    def monthly_downloads(self, app_ids: Iterable[str]) -> Dict[str, int]:
+        """Counts for ``app_ids``: fresh from the store, missing ones fetched now, stale ones refreshed later."""
+        result, missing, stale = {}, [], []
+        for app_id in dict.fromkeys(app_ids):
+            count = self.stored(app_id)
+            age = self.cache.age(stats_url(app_id)) if self.cache and count is not None else None
+            if count is None:
+                missing.append(app_id)
+                continue
+            result[app_id] = count
+            if age is not None and age >= self.ttl:
+                stale.append(app_id)
+
+        self.counts['fresh'] += len(result) - len(stale)
+        if self.bulk and (missing or stale):
+            popular = self.load_popular(missing + stale)
+            result.update(popular)
+            self.counts['bulk'] += len(popular)
+            missing = [app_id for app_id in missing if app_id not in popular]
+            stale = [app_id for app_id in stale if app_id not in popular]
+        self.counts['stale'] += len(stale)
+        if self.session is None:
+            self.counts['unknown'] += len(missing)
+            return result
+
+        with ThreadPoolExecutor(max_workers=STATS_WORKERS) as executor:
+            for app_id, count in zip(missing, executor.map(self.fetch, missing)):
+                if count is None:
+                    self.counts['unknown'] += 1
+                else:
+                    result[app_id] = count
+                    self.counts['fetched'] += 1
+
+        if stale:
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=STATS_WORKERS, thread_name_prefix='stats-refresh')
+            for app_id in stale:
+                self._refresher.submit(self.fetch, app_id, True)
+        return result
+
+    def wait(self):
+        """Wait for background refreshes to be stored."""
+        if self._refresher:
+            self._refresher.shutdown(wait=True)
+            self._refresher = None
+
+    def log_summary(self):
+        """Log how the counts of this run were obtained, then the cache and HTTP statistics."""
+        logger.info(f"Download stats: {self.counts['fresh']} fresh, {self.counts['stale']} stale "
+                    f"(refreshed in the background), {self.counts['bulk']} from the popular collection, "
+                    f"{self.counts['fetched']} fetched, {self.counts['unknown']} unknown")
+        if self.cache:
+            self.cache.log_summary()
+        if self.session is not None and hasattr(self.session, 'log_summary'):
+            self.session.log_summary()
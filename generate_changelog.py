@@ -9,7 +9,6 @@ import json
 import logging
 import os
 import sys
-import requests
 import tempfile
 import zipfile
 from datetime import datetime, timedelta
@@ -17,6 +16,10 @@ from typing import Dict, List, Optional, Tuple, Set
 from dataclasses import dataclass
 from github import Github
 
+from download_stats import DEFAULT_STATS_TTL, DownloadStats, create_stats_session
+from http_client import create_session
+from snapshot import Snapshot
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -49,13 +52,32 @@ class HistoricalSnapshot:
 class ChangelogGenerator:
     """Generates markdown changelog from flatpak runtime update data."""
     
-    def __init__(self, github_token: str, repo_name: str, output_file: str = "index.md"):
-        """Initialize the changelog generator."""
-        self.github = Github(github_token)
-        self.repo = self.github.get_repo(repo_name)
+    def __init__(self, github_token: Optional[str], repo_name: Optional[str], output_file: str = "index.md",
+                 snapshot: Optional[Snapshot] = None, stats_ttl: int = DEFAULT_STATS_TTL):
+        """Initialize the changelog generator; an offline snapshot replaces GitHub and the clock."""
         self.output_file = output_file
-        self.current_date = datetime.now()
         self.github_token = github_token
+        self.session = create_session()
+        if snapshot and not snapshot.record:
+            self.github = None
+            self.repo = snapshot.repository()
+            # Replays render the dashboard as of the recording, so they are reproducible
+            self.current_date = snapshot.recorded_at or datetime.now()
+            self.session = snapshot.session(self.session)
+        else:
+            self.github = Github(github_token)
+            self.repo = self.github.get_repo(repo_name)
+            self.current_date = datetime.now()
+            if snapshot:
+                self.session = snapshot.session(self.session)
+                snapshot.record_repository(self.repo, closed_since=self.current_date - timedelta(days=7),
+                                           workflow_name="Check Flatpak Runtime Updates")
+        if snapshot:
+            # Stored stats would hide inputs from the snapshot
+            self.stats = DownloadStats(session=snapshot.session(create_stats_session()), ttl=stats_ttl)
+        else:
+            # Download counts come from the store shared with issue_generator
+            self.stats = DownloadStats.open(ttl=stats_ttl)
         # Jekyll front matter for the index page
         self.jekyll_front_matter = """---
 layout: default
@@ -116,7 +138,7 @@ title: Home
                 'Accept': 'application/vnd.github.v3+json'
             }
             
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url, headers=headers, timeout=30)
             response.raise_for_status()
             artifacts = response.json()
             
@@ -133,7 +155,7 @@ title: Home
             
             # Download the artifact
             download_url = target_artifact['archive_download_url']
-            download_response = requests.get(download_url, headers=headers)
+            download_response = self.session.get(download_url, headers=headers, timeout=120)
             download_response.raise_for_status()
             
             # Extract the ZIP file and read the JSON
@@ -181,7 +203,7 @@ title: Home
                     outdated_packages=outdated_ids,
                     all_tracked_packages=all_tracked_ids,
                     total_checked=data.get('total_checked', 0),
-                    outdated_count=data.get('outdated_count', 0)
+                    outdated_count=len(outdated_ids)
                 )
                 snapshots.append(snapshot)
                 logger.info(f"  Loaded snapshot from {run_date.strftime('%Y-%m-%d')}: {len(outdated_ids)} outdated packages")
@@ -212,8 +234,13 @@ title: Home
             with open(file_path, 'r') as f:
                 data = json.load(f)
             
+            # Multi-arch runs list an app once per outdated arch; report each app once
             packages = []
+            seen = set()
             for item in data.get('outdated_packages', []):
+                if item['flatpak_id'] in seen:
+                    continue
+                seen.add(item['flatpak_id'])
                 package = OutdatedPackage(
                     flatpak_id=item['flatpak_id'],
                     sources=item['sources'],
@@ -228,7 +255,7 @@ title: Home
             metadata = {
                 'timestamp': data.get('timestamp', ''),
                 'total_checked': data.get('total_checked', 0),
-                'outdated_count': data.get('outdated_count', 0)
+                'outdated_count': len(packages)
             }
             
             return packages, all_tracked_packages, metadata
@@ -621,6 +648,10 @@ This scheduled workflow run checked {total_tracked} flatpak applications across
         
         logger.info(f"Found {len(packages)} outdated packages, {len(all_tracked)} total tracked")
         
+        downloads = self.stats.monthly_downloads(package.flatpak_id for package in packages)
+        for package in packages:
+            package.monthly_downloads = downloads.get(package.flatpak_id, 0)
+        
         # Fetch previous snapshot for diff generation
         previous_snapshot = None
         try:
@@ -633,13 +664,14 @@ This scheduled workflow run checked {total_tracked} flatpak applications across
                 prev_data = self.download_artifact_data(latest_run['id'])
                 
                 if prev_data:
+                    prev_outdated_ids = set(p['flatpak_id'] for p in prev_data.get('outdated_packages', []))
                     previous_snapshot = HistoricalSnapshot(
                         run_date=latest_run['created_at'],
                         run_id=latest_run['id'],
-                        outdated_packages=set(p['flatpak_id'] for p in prev_data.get('outdated_packages', [])),
+                        outdated_packages=prev_outdated_ids,
                         all_tracked_packages=set(prev_data.get('all_tracked_packages', [])),
                         total_checked=prev_data.get('total_checked', 0),
-                        outdated_count=prev_data.get('outdated_count', 0)
+                        outdated_count=len(prev_outdated_ids)
                     )
                     logger.info(f"Loaded previous snapshot: {len(previous_snapshot.outdated_packages)} outdated packages")
         except Exception as e:
@@ -714,6 +746,15 @@ def main():
     
     parser = argparse.ArgumentParser(description='Generate changelog from flatpak runtime update data')
     parser.add_argument('outdated_file', help='Path to outdated_packages.json file')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--offline', metavar='DIR',
+                                help='Read workflow runs, artifacts and issues from the snapshot in DIR '
+                                     'and make no network calls')
+    snapshot_group.add_argument('--record-snapshot', metavar='DIR',
+                                help='Record every input of this run into DIR for --offline')
+    parser.add_argument('--stats-ttl', type=int, default=DEFAULT_STATS_TTL, metavar='SECONDS',
+                        help=f'Age after which stored download counts are refreshed in the background '
+                             f'(default: {DEFAULT_STATS_TTL})')
     args = parser.parse_args()
     
     outdated_file = args.outdated_file
@@ -721,11 +762,11 @@ def main():
     github_token = os.environ.get('GITHUB_TOKEN')
     repo_name = os.environ.get('GITHUB_REPOSITORY')
     
-    if not github_token:
+    if not github_token and not args.offline:
         logger.error("GITHUB_TOKEN environment variable is required")
         sys.exit(1)
         
-    if not repo_name:
+    if not repo_name and not args.offline:
         logger.error("GITHUB_REPOSITORY environment variable is required")
         sys.exit(1)
     
@@ -734,8 +775,16 @@ def main():
         sys.exit(1)
     
     # Generate changelog
-    generator = ChangelogGenerator(github_token, repo_name)
+    snapshot = None
+    if args.offline or args.record_snapshot:
+        snapshot = Snapshot(args.offline or args.record_snapshot, record=bool(args.record_snapshot))
+    generator = ChangelogGenerator(github_token, repo_name, snapshot=snapshot, stats_ttl=args.stats_ttl)
     generator.generate_changelog(outdated_file)
+    generator.stats.wait()
+    generator.stats.log_summary()
+    generator.session.log_summary()
+    if snapshot:
+        snapshot.log_summary()
     
     logger.info("Changelog generation complete")
 
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk HTTP response cache with ETag/Last-Modified revalidation.
+Used for the Flathub API lookups so unchanged documents come back as 304s.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Default cache location, persisted between workflow runs with actions/cache
+DEFAULT_CACHE_DIR = os.environ.get('FLATPAK_TRACKER_CACHE_DIR', '.cache/flatpak-tracker')
+
+# Serve entries younger than this without contacting the server at all
+DEFAULT_TTL = 6 * 60 * 60
+
+# Evict least recently used entries once the cache grows beyond this size
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class CachedResponse:
+    """Minimal response object returned by the cache."""
+    status_code: int
+    text: str
+    from_cache: bool = False
+    revalidated: bool = False
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+@dataclass
+class CacheStats:
+    """Counters reported at the end of a run."""
+    fresh_hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+class ResponseCache:
+    """Disk-backed cache of GET responses keyed by URL."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, namespace: str = 'http',
+                 ttl: int = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Initialize the cache, creating the directory if needed."""
+        self.directory = os.path.join(cache_dir, namespace)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Track entry sizes in memory so eviction does not rescan the directory
+        self._sizes: Dict[str, int] = {}
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    self._sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+
+    def _entry_name(self, url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json'
+
+    def _load(self, name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, name), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, name: str, entry: Dict):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug(f"Could not write cache entry {name}: {e}")
+            return
+        with self._lock:
+            self._sizes[name] = os.path.getsize(path)
+        self._evict()
+
+    def _touch(self, name: str):
+        try:
+            os.utime(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        with self._lock:
+            total = sum(self._sizes.values())
+            if total <= self.max_bytes:
+                return
+            entries = []
+            for name in self._sizes:
+                try:
+                    entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+                except OSError:
+                    entries.append((0, name))
+            entries.sort()
+            for _, name in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                total -= self._sizes.pop(name, 0)
+                self.stats.evictions += 1
+
+    def get(self, session: requests.Session, url: str, timeout: int = 30,
+            ttl: Optional[int] = None, transform: Optional[Callable[[str], str]] = None) -> CachedResponse:
+        """GET a URL, serving fresh entries from disk and revalidating stale ones.
+
+        ``transform`` is applied to 200 bodies before they are stored and returned,
+        so callers can keep only the parts of a document they need.
+        Network errors are raised to the caller, matching a plain ``session.get``.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        name = self._entry_name(url)
+        entry = self._load(name)
+
+        if entry and time.time() - entry.get('fetched_at', 0) < ttl:
+            self._touch(name)
+            with self._lock:
+                self.stats.fresh_hits += 1
+            return CachedResponse(status_code=200, text=entry['body'], from_cache=True)
+
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = session.get(url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and entry:
+            entry['fetched_at'] = time.time()
+            self._store(name, entry)
+            with self._lock:
+                self.stats.revalidated += 1
+            return CachedResponse(status_code=200, text=entry['body'], from_cache=True, revalidated=True)
+
+        with self._lock:
+            self.stats.misses += 1
+
+        if response.status_code == 200:
+            body = transform(response.text) if transform else response.text
+            self._store(name, {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'body': body
+            })
+            return CachedResponse(status_code=200, text=body)
+
+        return CachedResponse(status_code=response.status_code, text=response.text)
+
+    def get_stale(self, url: str) -> Optional[str]:
+        """Return the stored body for a URL regardless of age, or None if never cached."""
+        entry = self._load(self._entry_name(url))
+        return entry['body'] if entry else None
+
+    def put(self, url: str, body: str):
+        """Store a body for a URL as if it had just been fetched, for documents that arrive in bulk."""
+        self._store(self._entry_name(url), {
+            'url': url,
+            'etag': None,
+            'last_modified': None,
+            'fetched_at': time.time(),
+            'body': body
+        })
+
+    def age(self, url: str) -> Optional[float]:
+        """Seconds since a URL was last fetched or revalidated, or None if never cached."""
+        entry = self._load(self._entry_name(url))
+        return time.time() - entry.get('fetched_at', 0) if entry else None
+
+    def log_summary(self):
+        """Log hit/miss statistics for this run."""
+        total_bytes = sum(self._sizes.values())
+        logger.info(
+            f"Response cache: {self.stats.fresh_hits} fresh hits, {self.stats.revalidated} revalidated (304), "
+            f"{self.stats.misses} misses, {self.stats.evictions} evictions, "
+            f"{len(self._sizes)} entries ({total_bytes / 1024:.0f} KiB) in {self.directory}"
+        )
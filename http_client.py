@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the tracker scripts.
+Keeps a keep-alive connection pool per host (optionally HTTP/2 for Flathub
+when httpx is installed), retries 5xx/429 responses and connection errors with
+jittered exponential backoff (honouring Retry-After), stops calling a host once
+a per-host circuit breaker has tripped, and adapts the number of in-flight
+Flathub requests with an AIMD controller and, optionally, their rate with a
+token bucket. New connections and bytes received are counted per host so
+connection reuse can be measured.
+"""
+
+import importlib.util
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+try:
+    import httpx
+except ImportError:  # HTTP/2 support is optional
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# httpx logs every request at INFO; per-host totals are reported by log_summary instead
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+# Attempts after the first one for a retryable failure
+DEFAULT_RETRIES = 3
+
+# Backoff is drawn uniformly from [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)]
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Responses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Consecutive failures that open a host's circuit, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+
+# Only these methods are safe to repeat
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Hosts whose in-flight requests are governed by a ConcurrencyController
+FLATHUB_HOST = 'flathub.org'
+
+# Starting number of in-flight requests before the controller adapts it
+INITIAL_CONCURRENCY = 4
+
+# Smoothed latency above this multiple of the baseline counts as congestion
+LATENCY_TOLERANCE = 2.0
+
+# Multiplicative decrease applied on 429/5xx, connection errors or congestion
+DECREASE_FACTOR = 0.5
+
+# Lowest rate, in requests per second, a TokenBucket backs off to after 429 responses
+MIN_RATE = 0.5
+
+# Number of per-host keep-alive pools kept open at once
+DEFAULT_POOL_HOSTS = 10
+
+# Headers that are specific to HTTP/1.1 connections and invalid in HTTP/2
+HOP_BY_HOP_HEADERS = frozenset({'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade', 'host'})
+
+
+@dataclass
+class ClientConfig:
+    """Tuning knobs for create_session, overridable from the environment.
+
+    FLATPAK_TRACKER_HTTP2         auto (default), 1 or 0: HTTP/2 for flathub.org via httpx
+    FLATPAK_TRACKER_POOL_HOSTS    per-host keep-alive pools kept open at once
+    FLATPAK_TRACKER_POOL_SIZE     connections kept per host (default: sized by the caller)
+    FLATPAK_TRACKER_HTTP_RETRIES  retries for 5xx/429 and connection errors
+    FLATPAK_TRACKER_RATE_LIMIT    requests per second for sessions created with a rate limit
+    """
+    http2: Optional[bool] = None
+    pool_hosts: int = DEFAULT_POOL_HOSTS
+    pool_size: Optional[int] = None
+    retries: int = DEFAULT_RETRIES
+    rate_limit: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> 'ClientConfig':
+        http2 = os.environ.get('FLATPAK_TRACKER_HTTP2', 'auto').strip().lower()
+        pool_size = os.environ.get('FLATPAK_TRACKER_POOL_SIZE')
+        rate_limit = os.environ.get('FLATPAK_TRACKER_RATE_LIMIT')
+        return cls(
+            http2=None if http2 == 'auto' else http2 in ('1', 'true', 'yes', 'on'),
+            pool_hosts=int(os.environ.get('FLATPAK_TRACKER_POOL_HOSTS', DEFAULT_POOL_HOSTS)),
+            pool_size=int(pool_size) if pool_size else None,
+            retries=int(os.environ.get('FLATPAK_TRACKER_HTTP_RETRIES', DEFAULT_RETRIES)),
+            rate_limit=float(rate_limit) if rate_limit else None
+        )
+
+    def use_http2(self) -> bool:
+        """HTTP/2 needs httpx with the h2 extra; 'auto' uses it whenever it is installed."""
+        available = httpx is not None and importlib.util.find_spec('h2') is not None
+        if self.http2 and not available:
+            logger.warning("HTTP/2 requested but httpx[http2] is not installed; using HTTP/1.1")
+        return available and self.http2 is not False
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of contacting a host whose circuit breaker is open."""
+
+
+@dataclass
+class HostStats:
+    """Per-host counters reported at the end of a run."""
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
+    trips: int = 0
+    short_circuited: int = 0
+    connections: int = 0
+    bytes_received: int = 0
+    http2_responses: int = 0
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for a single host.
+
+    After ``threshold`` failures in a row the circuit opens and calls fail
+    immediately. Once ``cooldown`` seconds have passed a single probe request
+    is let through; success closes the circuit, failure re-opens it. A probe
+    that ends any other way (an unexpected exception) leaves the circuit open
+    and lets the next request probe again.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._prober: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a request may be sent to the host now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.probing = True
+            self._prober = threading.get_ident()
+            return True
+
+    def finish(self):
+        """End the calling thread's probe if neither a success nor a failure settled it."""
+        with self._lock:
+            if self.probing and self._prober == threading.get_ident():
+                self.probing = False
+                self._prober = None
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> bool:
+        """Record a failure, returning True if this failure opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.probing = False
+                return True
+            return False
+
+
+class ConcurrencyController:
+    """AIMD limit on the number of in-flight requests to one host.
+
+    The limit grows by one after each window of ``limit`` healthy responses and
+    is halved on 429/5xx, connection errors, or when the smoothed latency
+    climbs well above the lowest latency seen. At most one decrease happens
+    until the requests sent under the previous limit have completed, so a burst
+    of failures from one round of requests counts once.
+    """
+
+    def __init__(self, host: str, initial: int = INITIAL_CONCURRENCY, minimum: int = 1,
+                 maximum: int = 32, latency_tolerance: float = LATENCY_TOLERANCE):
+        self.host = host
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = max(minimum, min(initial, self.maximum))
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.completed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.peak = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self._healthy = 0
+        self._since_decrease = 0
+        self._drain = 0
+        self._smoothed: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request slot is free."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+
+    def release(self, latency: Optional[float], overloaded: bool):
+        """Free a slot and feed the outcome of the request into the controller."""
+        with self._cond:
+            self.in_flight -= 1
+            self.completed += 1
+            self.finished_at = time.monotonic()
+            self._since_decrease += 1
+            if overloaded:
+                self._decrease("429/5xx or connection error")
+            elif latency is not None and self._since_decrease >= self._drain:
+                self._smoothed = latency if self._smoothed is None else 0.8 * self._smoothed + 0.2 * latency
+                # Let the baseline drift up slowly so a lasting change in latency is not congestion forever
+                if self._baseline is None:
+                    self._baseline = self._smoothed
+                else:
+                    self._baseline = min(self._smoothed, self._baseline * 1.001)
+                # The absolute margin keeps jitter on very fast responses from looking like congestion
+                if self._smoothed > max(self._baseline * self.latency_tolerance, self._baseline + 0.1):
+                    self._decrease(f"latency {self._smoothed:.2f}s vs baseline {self._baseline:.2f}s")
+                else:
+                    self._healthy += 1
+                    if self._healthy >= self.limit and self.limit < self.maximum:
+                        self._set_limit(self.limit + 1, "healthy window")
+                        self.increases += 1
+            self._cond.notify_all()
+
+    def throughput(self) -> float:
+        """Completed requests per second between the first and last request."""
+        if self.started_at is None or not self.finished_at or self.finished_at <= self.started_at:
+            return 0.0
+        return self.completed / (self.finished_at - self.started_at)
+
+    def _decrease(self, reason: str):
+        self._healthy = 0
+        # Requests already in flight at the last decrease still reflect the old limit
+        if self._since_decrease < self._drain or self.limit <= self.minimum:
+            return
+        self._drain = self.limit
+        self._set_limit(max(self.minimum, int(self.limit * DECREASE_FACTOR)), reason)
+        self.decreases += 1
+        self._since_decrease = 0
+        self._smoothed = None
+
+    def _set_limit(self, limit: int, reason: str):
+        # Decreases are the interesting decisions; the steady climb is only logged at debug level
+        log = logger.info if limit < self.limit else logger.debug
+        log(f"Concurrency for {self.host}: {self.limit} -> {limit} ({reason})")
+        self.limit = limit
+        self.peak = max(self.peak, limit)
+        self._healthy = 0
+
+
+class TokenBucket:
+    """Token bucket limiting the rate of requests to one host.
+
+    Tokens refill at ``rate`` per second up to ``burst``, and each request takes
+    one. A 429 halves the rate, at most once a second so a burst of 429s from
+    requests already in flight counts once, and pauses the bucket for its
+    Retry-After. Each window of ``rate`` accepted responses adds one request
+    per second back, up to the configured rate, so the bucket settles just
+    below the host's limit.
+    """
+
+    def __init__(self, host: str, rate: float, burst: Optional[float] = None, minimum: float = MIN_RATE):
+        self.host = host
+        self.maximum = rate
+        self.rate = rate
+        self.minimum = min(minimum, rate)
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.throttled = 0
+        self.waited = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._decreased_at = 0.0
+        self._accepted = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                delay = self._paused_until - now
+                if delay <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if delay <= 0:
+                    delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
+
+    def record(self, rate_limited: bool, retry_after: Optional[float] = None):
+        """Feed the status of a response into the bucket."""
+        with self._lock:
+            if rate_limited:
+                self.throttled += 1
+                self._accepted = 0
+                self.tokens = 0
+                now = time.monotonic()
+                if self.rate > self.minimum and now - self._decreased_at >= 1.0:
+                    self.rate = max(self.minimum, self.rate * DECREASE_FACTOR)
+                    self._decreased_at = now
+                    logger.info(f"Rate for {self.host} lowered to {self.rate:.1f} requests/s after HTTP 429")
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+            else:
+                self._accepted += 1
+                if self._accepted >= self.rate and self.rate < self.maximum:
+                    self.rate = min(self.maximum, self.rate + 1)
+                    self._accepted = 0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _netloc(scheme: str, host: str, port: Optional[int]) -> str:
+    if port is None or (scheme, port) in (('http', 80), ('https', 443)):
+        return host
+    return f"{host}:{port}"
+
+
+def _counting_pool(base, on_new_connection: Callable[[str], None]):
+    """Subclass a urllib3 connection pool so each new connection (handshake) is reported."""
+    def _new_conn(self):
+        on_new_connection(_netloc(self.scheme, self.host, self.port))
+        return base._new_conn(self)
+    return type(f"Counting{base.__name__}", (base,), {'_new_conn': _new_conn})
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose per-host keep-alive pools report every new connection."""
+
+    def __init__(self, on_new_connection: Callable[[str], None], **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self._on_new_connection),
+            'https': _counting_pool(HTTPSConnectionPool, self._on_new_connection),
+        }
+
+
+class HTTPXAdapter(BaseAdapter):
+    """Transport adapter that sends requests over an httpx client with HTTP/2.
+
+    Requests to a host share one multiplexed connection instead of a pool of
+    HTTP/1.1 connections. Responses are converted to ``requests.Response`` and
+    httpx errors to their requests equivalents, so retries, caching and
+    callers' error handling work unchanged.
+    """
+
+    def __init__(self, on_new_connection: Callable[[str], None], pool_size: int = 10):
+        super().__init__()
+        self._on_new_connection = on_new_connection
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.Client(http2=True, limits=limits)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(timeout)
+        parsed = urlparse(request.url)
+        netloc = _netloc(parsed.scheme, parsed.hostname, parsed.port)
+
+        def trace(event: str, info):
+            if event == 'connection.connect_tcp.complete':
+                self._on_new_connection(netloc)
+
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+        try:
+            reply = self.client.request(request.method, request.url, headers=headers, content=request.body,
+                                        timeout=timeout, extensions={'trace': trace})
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e, request=request)
+
+        response = requests.Response()
+        response.status_code = reply.status_code
+        response.headers = CaseInsensitiveDict(reply.headers.multi_items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = reply.reason_phrase
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = reply.content
+        response._content_consumed = True
+        response.http_version = reply.http_version
+        response.wire_bytes = reply.num_bytes_downloaded
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class RetryingSession(requests.Session):
+    """requests.Session with retries, backoff and per-host circuit breakers.
+
+    Callers keep using ``get``/``head`` and catching ``requests.RequestException``.
+    When retries run out on a retryable status the last response is returned,
+    so existing status-code handling keeps working. With ``max_concurrency``,
+    requests to ``concurrency_hosts`` also wait for a ConcurrencyController slot,
+    and with ``rate_limit`` for a TokenBucket token, retries included. Once
+    ``deadline`` (a ``time.monotonic()`` value) is set, no retry is started
+    whose backoff would end past it; ``max_elapsed`` does the same for a time
+    budget per request, so a timed-out attempt is not retried past it.
+    """
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, breaker_threshold: int = BREAKER_THRESHOLD,
+                 breaker_cooldown: float = BREAKER_COOLDOWN, max_concurrency: Optional[int] = None,
+                 concurrency_hosts: Iterable[str] = (FLATHUB_HOST,), rate_limit: Optional[float] = None,
+                 max_elapsed: Optional[float] = None):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.concurrency_hosts = frozenset(concurrency_hosts)
+        self.controllers: Dict[str, ConcurrencyController] = {}
+        self.rate_limit = rate_limit
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.host_stats: Dict[str, HostStats] = {}
+        self.deadline: Optional[float] = None
+        self.max_elapsed = max_elapsed
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str):
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+                self.host_stats[host] = HostStats()
+                if self.max_concurrency and host in self.concurrency_hosts:
+                    self.controllers[host] = ConcurrencyController(
+                        host, initial=min(INITIAL_CONCURRENCY, self.max_concurrency), maximum=self.max_concurrency)
+                if self.rate_limit and host in self.concurrency_hosts:
+                    self.buckets[host] = TokenBucket(host, self.rate_limit)
+            return self._breakers[host], self.host_stats[host]
+
+    def _send(self, host: str, method, url, *args, **kwargs):
+        """Send one attempt, holding a concurrency slot for hosts that have a controller."""
+        bucket = self.buckets.get(host)
+        if bucket:
+            bucket.acquire()
+        controller = self.controllers.get(host)
+        if controller is None:
+            response = super().request(method, url, *args, **kwargs)
+        else:
+            controller.acquire()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                controller.release(None, overloaded=True)
+                raise
+            except Exception:
+                controller.release(None, overloaded=False)
+                raise
+            controller.release(time.monotonic() - started, overloaded=response.status_code in RETRY_STATUSES)
+        if bucket:
+            bucket.record(response.status_code == 429, parse_retry_after(response.headers.get('Retry-After')))
+        self._record_transfer(response)
+        return response
+
+    def record_connection(self, host: str):
+        """Count a new connection, i.e. a TCP (and TLS) handshake, to a host."""
+        _, stats = self._host(host)
+        with self._lock:
+            stats.connections += 1
+
+    def _record_transfer(self, response: requests.Response):
+        # Redirect hops are attributed to the host that actually served them
+        for hop in [*response.history, response]:
+            wire_bytes = getattr(hop, 'wire_bytes', None)
+            if wire_bytes is None:
+                tell = getattr(hop.raw, 'tell', None)
+                wire_bytes = tell() if tell else len(hop.content or b'')
+            _, stats = self._host(urlparse(hop.url).netloc)
+            with self._lock:
+                stats.bytes_received += wire_bytes
+                if getattr(hop, 'http_version', None) == 'HTTP/2':
+                    stats.http2_responses += 1
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlparse(url).netloc
+        breaker, stats = self._host(host)
+        attempts = 1 + (self.retries if method.upper() in IDEMPOTENT_METHODS else 0)
+        deadline = self.deadline
+        if self.max_elapsed is not None:
+            budget_end = time.monotonic() + self.max_elapsed
+            deadline = budget_end if deadline is None else min(deadline, budget_end)
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                with self._lock:
+                    stats.short_circuited += 1
+                raise CircuitOpenError(f"Circuit open for {host}, not requesting {url}")
+            with self._lock:
+                stats.requests += 1
+
+            retry_after = None
+            try:
+                try:
+                    response = self._send(host, method, url, *args, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    failed, error, response = True, e, None
+                else:
+                    # Rate limiting is retried but means the host is up, so it counts as a success for the breaker
+                    if response.status_code not in RETRY_STATUSES or response.status_code == 429:
+                        breaker.record_success()
+                    if response.status_code not in RETRY_STATUSES:
+                        return response
+                    failed, error = response.status_code != 429, None
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+                if failed:
+                    with self._lock:
+                        stats.failures += 1
+                    if breaker.record_failure():
+                        with self._lock:
+                            stats.trips += 1
+                        logger.warning(f"Circuit breaker opened for {host} after repeated failures; "
+                                       f"pausing requests for {self.breaker_cooldown:.0f}s")
+            finally:
+                # A probe that was not settled above must not keep the circuit open for good
+                breaker.finish()
+
+            if attempt + 1 >= attempts:
+                break
+
+            delay = self._backoff(attempt, retry_after)
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                logger.debug(f"Not retrying {url} ({reason}): the backoff would run past the deadline")
+                break
+            logger.debug(f"Retrying {url} in {delay:.1f}s ({reason}, attempt {attempt + 2}/{attempts})")
+            with self._lock:
+                stats.retries += 1
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+            if deadline is not None and isinstance(kwargs.get('timeout'), (int, float)):
+                kwargs['timeout'] = max(0.1, min(kwargs['timeout'], deadline - time.monotonic()))
+
+        if error is not None:
+            raise error
+        return response
+
+    def log_summary(self):
+        """Log per-host requests, connections, bytes, retries and circuit breaker counts for this run."""
+        for host, stats in sorted(self.host_stats.items()):
+            http2 = f", {stats.http2_responses} over HTTP/2" if stats.http2_responses else ""
+            logger.info(
+                f"HTTP {host}: {stats.requests} requests, {stats.connections} new connections, "
+                f"{stats.bytes_received / 1024:.0f} KiB received{http2}, {stats.retries} retries, "
+                f"{stats.failures} failures, {stats.trips} breaker trips, "
+                f"{stats.short_circuited} short-circuited"
+            )
+        for host, controller in sorted(self.controllers.items()):
+            logger.info(
+                f"Concurrency for {host} settled at {controller.limit} in flight, "
+                f"{controller.throughput():.1f} requests/s (peak {controller.peak}, "
+                f"{controller.increases} increases, {controller.decreases} decreases)"
+            )
+        for host, bucket in sorted(self.buckets.items()):
+            logger.info(
+                f"Rate for {host} ended at {bucket.rate:.1f} of {bucket.maximum:.1f} requests/s "
+                f"({bucket.throttled} throttled, {bucket.waited:.1f}s spent waiting for tokens across workers)"
+            )
+
+
+def create_session(pool_maxsize: int = 10, config: Optional[ClientConfig] = None, **kwargs) -> RetryingSession:
+    """Create the shared client: a retrying session with keep-alive pools per host.
+
+    ``pool_maxsize`` is the number of connections kept per host, normally the
+    caller's worker count. ``config`` defaults to ClientConfig.from_env(), whose
+    rate limit replaces the caller's ``rate_limit`` when both are set.
+    """
+    config = config or ClientConfig.from_env()
+    pool_maxsize = config.pool_size or pool_maxsize
+    kwargs.setdefault('retries', config.retries)
+    if config.rate_limit and kwargs.get('rate_limit'):
+        kwargs['rate_limit'] = config.rate_limit
+    session = RetryingSession(**kwargs)
+    adapter = CountingHTTPAdapter(session.record_connection, pool_connections=config.pool_hosts,
+                                  pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if config.use_http2():
+        session.mount(f'https://{FLATHUB_HOST}/', HTTPXAdapter(session.record_connection, pool_size=pool_maxsize))
+    return session
@@ -9,16 +9,24 @@ import logging
 import os
 import sys
 import re
-import requests
-import time
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
 from github import Github
 
+from download_stats import DEFAULT_STATS_TTL, DownloadStats, create_stats_session
+from snapshot import Snapshot
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Kinds of GitHub writes a plan can contain, in the order they are reported
+ISSUE_ACTIONS = ('create', 'edit', 'label', 'comment', 'close')
+
+# Issues per page when listing the repository's open issues (GitHub's maximum)
+ISSUES_PER_PAGE = 100
+
 
 @dataclass
 class OutdatedPackage:
@@ -31,15 +39,39 @@ class OutdatedPackage:
     latest_version: str
     installs: int = 0
     monthly_downloads: int = 0
+    arches: List[str] = field(default_factory=list)
+
+
+@dataclass
+class IssueOperation:
+    """One GitHub write planned by IssueGenerator.plan."""
+    action: str
+    flatpak_id: str
+    issue: Optional[Any] = None
+    title: Optional[str] = None
+    body: Optional[str] = None
+    labels: List[str] = field(default_factory=list)
+    reason: str = ''
+    
+    def describe(self) -> str:
+        target = f"#{self.issue.number}" if self.issue is not None else "new"
+        details = ', '.join(filter(None, [self.reason, ', '.join(self.labels)]))
+        return f"{self.action:<8} {target:<6} {self.flatpak_id}{f' ({details})' if details else ''}"
 
 
 class IssueGenerator:
     """Handles GitHub issue creation for outdated flatpak packages."""
     
-    def __init__(self, github_token: str, repo_name: str):
-        """Initialize the issue generator with GitHub credentials."""
-        self.github = Github(github_token)
-        self.repo = self.github.get_repo(repo_name)
+    def __init__(self, github_token: Optional[str], repo_name: Optional[str], repo=None):
+        """Initialize the issue generator with GitHub credentials, or a stand-in ``repo`` for offline runs."""
+        if repo is not None:
+            self.github = None
+            self.repo = repo
+        else:
+            self.github = Github(github_token, per_page=ISSUES_PER_PAGE)
+            self.repo = self.github.get_repo(repo_name)
+        # Open runtime issues by flatpak ID, listed once per run
+        self._issue_index: Optional[Dict[str, List]] = None
     
     def extract_flatpak_id_from_issue_title(self, issue_title: str) -> Optional[str]:
         """Extract flatpak ID from issue title."""
@@ -48,6 +80,40 @@ class IssueGenerator:
             return match.group(1)
         return None
     
+    def open_issue_index(self) -> Dict[str, List]:
+        """Open runtime issues keyed by flatpak ID; the repository is listed on first use only."""
+        if self._issue_index is None:
+            index = {}
+            count = 0
+            issues = self.repo.get_issues(state='open')
+            # A snapshot's issues are already a single list
+            pages = [issues] if isinstance(issues, list) else self._issue_pages(issues)
+            fetched = 0
+            for page in pages:
+                fetched += 1
+                for issue in page:
+                    count += 1
+                    flatpak_id = self.extract_flatpak_id_from_issue_title(issue.title)
+                    if flatpak_id:
+                        index.setdefault(flatpak_id, []).append(issue)
+                    else:
+                        logger.debug(f"Could not extract flatpak ID from issue #{issue.number}: {issue.title}")
+            logger.info(f"Indexed {sum(len(issues) for issues in index.values())} open runtime issues "
+                        f"from {count} open issues ({fetched} page{'s' if fetched != 1 else ''})")
+            self._issue_index = index
+        return self._issue_index
+    
+    @staticmethod
+    def _issue_pages(issues):
+        """Fetch a PyGithub paginated list page by page, stopping after the first short page."""
+        number = 0
+        while True:
+            page = issues.get_page(number)
+            yield page
+            if len(page) < ISSUES_PER_PAGE:
+                return
+            number += 1
+    
     def _get_runtime_label(self, runtime: str) -> Optional[str]:
         """Extract runtime label from runtime string.
         
@@ -78,13 +144,16 @@ class IssueGenerator:
     def create_issue_body(self, package: OutdatedPackage) -> str:
         """Generate the issue body content."""
         sources_info = ', '.join(package.sources)
+        arches_info = ''
+        if package.arches and package.arches != ['x86_64']:
+            arches_info = f"\n**Outdated on:** {', '.join(f'`{arch}`' for arch in package.arches)}"
         
         return f"""
 ## Flatpak Runtime Update Needed
 
 **Package:** `{package.flatpak_id}`
 **Current Runtime:** `{package.current_runtime}`
-**Latest Available Runtime:** `{package.latest_runtime}`
+**Latest Available Runtime:** `{package.latest_runtime}`{arches_info}
 **Monthly Downloads:** `{package.monthly_downloads}`
 **Found in sources:** {sources_info}
 
@@ -144,64 +213,29 @@ This issue was automatically created by the flatpak-updater bot that monitors mu
 If this is a false positive or the runtime is intentionally pinned to an older version for compatibility reasons, please close this issue with a comment explaining why.
 """.strip()
     
+    def _drop_from_index(self, flatpak_id: str, issue):
+        """Forget an issue that was closed during this run."""
+        issues = self._issue_index.get(flatpak_id, [])
+        if issue in issues:
+            issues.remove(issue)
+        if not issues:
+            self._issue_index.pop(flatpak_id, None)
+    
     def find_existing_issue(self, flatpak_id: str) -> Optional[any]:
         """Find an existing issue for the given flatpak ID using exact matching."""
         try:
-            existing_issues = self.repo.get_issues(state='open')
-            for issue in existing_issues:
-                extracted_id = self.extract_flatpak_id_from_issue_title(issue.title)
-                if extracted_id == flatpak_id:
-                    logger.info(f"Found existing issue for {flatpak_id}: #{issue.number}")
-                    return issue
+            issues = self.open_issue_index().get(flatpak_id)
+            if issues:
+                logger.info(f"Found existing issue for {flatpak_id}: #{issues[0].number}")
+                return issues[0]
             return None
         except Exception as e:
             logger.error(f"Error checking existing issues: {e}")
             return None
     
-    def create_or_update_issue(self, package: OutdatedPackage, is_popular: bool = False) -> bool:
-        """Create a GitHub issue for an outdated package or update existing one."""
-        issue_title = f"Update runtime for {package.flatpak_id}"
-        
-        # Check if issue already exists
-        existing_issue = self.find_existing_issue(package.flatpak_id)
-        
-        # Generate body content
-        body = self.create_issue_body(package)
-        
-        labels = []
-        if is_popular:
-            labels.append("popular")
-        
-        # Add runtime version label
-        runtime_label = self._get_runtime_label(package.latest_runtime)
-        if runtime_label:
-            labels.append(runtime_label)
-
-        if existing_issue:
-            # Update existing issue
-            try:
-                # Check if the issue content needs updating
-                current_body = existing_issue.body or ""
-                
-                # Extract current runtime info from existing issue to check if update is needed
-                current_runtime_match = re.search(r'\*\*Current Runtime:\*\* `([^`]+)`', current_body)
-                current_runtime_in_issue = current_runtime_match.group(1) if current_runtime_match else None
-                
-                latest_runtime_match = re.search(r'\*\*Latest Available Runtime:\*\* `([^`]+)`', current_body)
-                latest_runtime_in_issue = latest_runtime_match.group(1) if latest_runtime_match else None
-                
-                # Update if runtime information has changed
-                needs_update = (
-                    current_runtime_in_issue != package.current_runtime or
-                    latest_runtime_in_issue != package.latest_runtime
-                )
-                
-                if needs_update:
-                    existing_issue.edit(title=issue_title, body=body)
-                    logger.info(f"Updated existing issue #{existing_issue.number} for {package.flatpak_id}")
-                    
-                    # Add a comment indicating the issue was updated
-                    update_comment = f"""
+    def _update_comment(self, package: OutdatedPackage) -> str:
+        """Comment posted when an existing issue is updated with new runtime information."""
+        return f"""
 🔄 **Issue Updated**
 
 This issue has been automatically updated with the latest runtime information:
@@ -213,56 +247,10 @@ The runtime update instructions remain the same.
 ---
 *This issue was automatically updated by the flatpak-updater bot.*
 """.strip()
-                    existing_issue.create_comment(update_comment)
-                    
-                    # Update labels
-                    if is_popular:
-                        existing_issue.add_to_labels("popular")
-                    runtime_label = self._get_runtime_label(package.latest_runtime)
-                    if runtime_label:
-                        existing_issue.add_to_labels(runtime_label)
-                    
-                    return True
-                else:
-                    logger.info(f"Issue #{existing_issue.number} for {package.flatpak_id} is already up to date")
-                    return False
-                    
-            except Exception as e:
-                logger.error(f"Failed to update existing issue #{existing_issue.number} for {package.flatpak_id}: {e}")
-                return False
-        else:
-            # Create new issue
-            try:
-                issue = self.repo.create_issue(
-                    title=issue_title,
-                    body=body,
-                    labels=labels
-                )
-                logger.info(f"Created new issue #{issue.number} for {package.flatpak_id}")
-                return True
-                
-            except Exception as e:
-                logger.error(f"Failed to create issue for {package.flatpak_id}: {e}")
-                return False
     
-    def close_resolved_issues(self, current_outdated_packages: List[str], all_tracked_packages: List[str]):
-        """Close issues for flatpaks that are no longer outdated or no longer tracked."""
-        logger.info("Checking for resolved runtime issues to close")
-        
-        try:
-            open_issues = self.repo.get_issues(state='open')
-            closed_count = 0
-            
-            for issue in open_issues:
-                flatpak_id = self.extract_flatpak_id_from_issue_title(issue.title)
-                if not flatpak_id:
-                    logger.debug(f"Could not extract flatpak ID from issue #{issue.number}: {issue.title}")
-                    continue
-                
-                # Check if this flatpak is no longer tracked at all
-                if flatpak_id not in all_tracked_packages:
-                    # This package is no longer being tracked in any source
-                    close_comment = f"""
+    def _untracked_comment(self, flatpak_id: str) -> str:
+        """Comment posted when closing the issue of a package that is no longer tracked."""
+        return f"""
 🔄 **Package No Longer Tracked**
 
 This issue is being automatically closed because:
@@ -285,19 +273,10 @@ If this package should still be tracked, please verify it exists in one of these
 ---
 *This issue was automatically closed by the flatpak-updater bot.*
 """.strip()
-                    
-                    try:
-                        issue.create_comment(close_comment)
-                        issue.edit(state='closed')
-                        logger.info(f"Closed issue #{issue.number} for no longer tracked package {flatpak_id}")
-                        closed_count += 1
-                    except Exception as e:
-                        logger.error(f"Failed to close issue #{issue.number} for {flatpak_id}: {e}")
-                
-                # Check if this flatpak is still tracked but no longer outdated
-                elif flatpak_id not in current_outdated_packages:
-                    # This package is still tracked but runtime is now up to date
-                    close_comment = f"""
+    
+    def _resolved_comment(self, flatpak_id: str) -> str:
+        """Comment posted when closing the issue of a package whose runtime is up to date."""
+        return f"""
 🎉 **Runtime Issue Resolved!**
 
 This issue is being automatically closed because:
@@ -309,60 +288,210 @@ If this was closed in error, please reopen the issue.
 ---
 *This issue was automatically closed by the flatpak-updater bot.*
 """.strip()
-                    
-                    try:
-                        issue.create_comment(close_comment)
-                        issue.edit(state='closed')
-                        logger.info(f"Closed resolved issue #{issue.number} for {flatpak_id}")
-                        closed_count += 1
-                    except Exception as e:
-                        logger.error(f"Failed to close issue #{issue.number} for {flatpak_id}: {e}")
-            
-            logger.info(f"Closed {closed_count} resolved or obsolete runtime issues")
-            
+    
+    def plan_package(self, package: OutdatedPackage, is_popular: bool = False) -> List[IssueOperation]:
+        """Operations that bring the issue of one outdated package to its desired state.
+        
+        A missing issue is created. An existing issue is edited, with a comment,
+        only when its runtime information changed; labels it lacks are added
+        either way. An issue that is already up to date needs no operations.
+        """
+        issue_title = f"Update runtime for {package.flatpak_id}"
+        labels = []
+        if is_popular:
+            labels.append("popular")
+        runtime_label = self._get_runtime_label(package.latest_runtime)
+        if runtime_label:
+            labels.append(runtime_label)
+        
+        existing_issue = self.find_existing_issue(package.flatpak_id)
+        if existing_issue is None:
+            return [IssueOperation('create', package.flatpak_id, title=issue_title,
+                                   body=self.create_issue_body(package), labels=labels)]
+        
+        operations = []
+        current_body = existing_issue.body or ""
+        
+        # Extract current runtime info from existing issue to check if update is needed
+        current_runtime_match = re.search(r'\*\*Current Runtime:\*\* `([^`]+)`', current_body)
+        current_runtime_in_issue = current_runtime_match.group(1) if current_runtime_match else None
+        
+        latest_runtime_match = re.search(r'\*\*Latest Available Runtime:\*\* `([^`]+)`', current_body)
+        latest_runtime_in_issue = latest_runtime_match.group(1) if latest_runtime_match else None
+        
+        if current_runtime_in_issue != package.current_runtime or latest_runtime_in_issue != package.latest_runtime:
+            operations.append(IssueOperation('edit', package.flatpak_id, existing_issue, title=issue_title,
+                                             body=self.create_issue_body(package),
+                                             reason=f"{latest_runtime_in_issue} -> {package.latest_runtime}"))
+            operations.append(IssueOperation('comment', package.flatpak_id, existing_issue,
+                                             body=self._update_comment(package), reason='runtime updated'))
+        
+        existing_labels = {label.name for label in existing_issue.labels}
+        missing_labels = [label for label in labels if label not in existing_labels]
+        if missing_labels:
+            operations.append(IssueOperation('label', package.flatpak_id, existing_issue, labels=missing_labels))
+        return operations
+    
+    def plan_closes(self, current_outdated_packages: List[str], all_tracked_packages: List[str],
+                    unchecked_packages: Optional[List[str]] = None) -> List[IssueOperation]:
+        """Close operations for open issues whose package is no longer outdated or no longer tracked.
+        
+        Packages in ``unchecked_packages`` were not checked before the runtime
+        checker's deadline, so their issues are left alone.
+        """
+        current_outdated_packages = set(current_outdated_packages)
+        all_tracked_packages = set(all_tracked_packages)
+        unchecked_packages = set(unchecked_packages or [])
+        operations = []
+        for flatpak_id, issues in self.open_issue_index().items():
+            for issue in issues:
+                if flatpak_id in unchecked_packages:
+                    logger.info(f"Leaving issue #{issue.number} open: {flatpak_id} was not checked this run")
+                elif flatpak_id not in all_tracked_packages:
+                    operations.append(IssueOperation('close', flatpak_id, issue,
+                                                     body=self._untracked_comment(flatpak_id),
+                                                     reason='no longer tracked'))
+                elif flatpak_id not in current_outdated_packages:
+                    operations.append(IssueOperation('close', flatpak_id, issue,
+                                                     body=self._resolved_comment(flatpak_id),
+                                                     reason='runtime up to date'))
+        return operations
+    
+    def plan(self, packages: List[OutdatedPackage], popular_package_ids: Set[str], all_tracked_packages: List[str],
+             unchecked_packages: Optional[List[str]] = None) -> List[IssueOperation]:
+        """Every operation needed to reconcile the open issues with the outdated packages, closes first.
+        
+        The open issues are listed once; planning itself makes no further API calls.
+        """
+        operations = self.plan_closes([package.flatpak_id for package in packages], all_tracked_packages,
+                                      unchecked_packages)
+        for package in packages:
+            operations.extend(self.plan_package(package, package.flatpak_id in popular_package_ids))
+        return operations
+    
+    def apply(self, operations: List[IssueOperation]) -> Dict[str, int]:
+        """Carry out planned operations and return how many of each action succeeded.
+        
+        When an operation fails, the remaining operations for that package are skipped.
+        """
+        applied = {action: 0 for action in ISSUE_ACTIONS}
+        failed = set()
+        for operation in operations:
+            if operation.flatpak_id in failed:
+                continue
+            issue = operation.issue
+            try:
+                if operation.action == 'create':
+                    issue = self.repo.create_issue(title=operation.title, body=operation.body,
+                                                   labels=operation.labels)
+                    logger.info(f"Created new issue #{issue.number} for {operation.flatpak_id}")
+                    self.open_issue_index().setdefault(operation.flatpak_id, []).append(issue)
+                elif operation.action == 'edit':
+                    issue.edit(title=operation.title, body=operation.body)
+                    logger.info(f"Updated existing issue #{issue.number} for {operation.flatpak_id}")
+                elif operation.action == 'comment':
+                    issue.create_comment(operation.body)
+                elif operation.action == 'label':
+                    issue.add_to_labels(*operation.labels)
+                    logger.info(f"Labelled issue #{issue.number} for {operation.flatpak_id}: "
+                                f"{', '.join(operation.labels)}")
+                elif operation.action == 'close':
+                    issue.create_comment(operation.body)
+                    issue.edit(state='closed')
+                    logger.info(f"Closed issue #{issue.number} for {operation.flatpak_id} ({operation.reason})")
+                    self._drop_from_index(operation.flatpak_id, issue)
+                applied[operation.action] += 1
+            except Exception as e:
+                target = f"issue #{issue.number}" if issue is not None else "issue"
+                logger.error(f"Failed to {operation.action} {target} for {operation.flatpak_id}: {e}")
+                failed.add(operation.flatpak_id)
+        return applied
+    
+    def create_or_update_issue(self, package: OutdatedPackage, is_popular: bool = False) -> bool:
+        """Create a GitHub issue for an outdated package or update existing one."""
+        operations = self.plan_package(package, is_popular)
+        if not operations:
+            logger.info(f"Issue for {package.flatpak_id} is already up to date")
+            return False
+        return sum(self.apply(operations).values()) > 0
+    
+    def close_resolved_issues(self, current_outdated_packages: List[str], all_tracked_packages: List[str],
+                              unchecked_packages: Optional[List[str]] = None):
+        """Close issues for flatpaks that are no longer outdated or no longer tracked.
+        
+        Packages in ``unchecked_packages`` were not checked before the runtime
+        checker's deadline, so their issues are left alone.
+        """
+        logger.info("Checking for resolved runtime issues to close")
+        try:
+            applied = self.apply(self.plan_closes(current_outdated_packages, all_tracked_packages,
+                                                  unchecked_packages))
+            logger.info(f"Closed {applied['close']} resolved or obsolete runtime issues")
         except Exception as e:
             logger.error(f"Failed to check for resolved issues: {e}")
 
 
-def load_outdated_packages(file_path: str) -> Tuple[List[OutdatedPackage], List[str]]:
-    """Load outdated packages from JSON file and return both outdated and all tracked packages."""
+def format_plan(operations: List[IssueOperation]) -> str:
+    """Human-readable listing of a plan, one operation per line after a summary."""
+    counts = {action: 0 for action in ISSUE_ACTIONS}
+    for operation in operations:
+        counts[operation.action] += 1
+    lines = [f"Plan: {', '.join(f'{count} {action}' for action, count in counts.items())}"]
+    for operation in operations:
+        lines.append(f"  {operation.describe()}")
+    return '\n'.join(lines)
+
+
+def fetch_download_stats(packages: List[OutdatedPackage], stats: DownloadStats):
+    """Fill in the monthly download counts of packages from the download stats store."""
+    counts = stats.monthly_downloads(package.flatpak_id for package in packages)
+    for package in packages:
+        package.monthly_downloads = counts.get(package.flatpak_id, 0)
+
+
+def load_outdated_packages(file_path: str,
+                           stats: Optional[DownloadStats] = None) -> Tuple[List[OutdatedPackage], List[str], List[str]]:
+    """Load outdated packages from JSON file.
+    
+    Multi-arch runs list an app once per outdated arch; those entries are folded
+    into one package (and one issue), described by the first arch listed.
+    Download counts are filled in from ``stats`` when given; callers can also
+    run ``fetch_download_stats`` themselves.
+    Returns the outdated packages, all tracked packages, and the packages the
+    runtime checker did not get to before its deadline.
+    """
     try:
         with open(file_path, 'r') as f:
             data = json.load(f)
         
-        packages = []
+        packages_by_id = {}
         for item in data.get('outdated_packages', []):
-            package = OutdatedPackage(
-                flatpak_id=item['flatpak_id'],
-                sources=item['sources'],
-                current_runtime=item['current_runtime'],
-                latest_runtime=item['latest_runtime'],
-                current_version=item['current_version'],
-                latest_version=item['latest_version']
-            )
-            
-            # Fetch install count from Flathub
-            try:
-                # Remove 'app/' prefix for API call - Flathub API expects just the app ID
-                app_id = package.flatpak_id[4:] if package.flatpak_id.startswith('app/') else package.flatpak_id
-                response = requests.get(f"https://flathub.org/api/v2/stats/{app_id}")
-                if response.status_code == 200:
-                    stats = response.json()
-                    package.monthly_downloads = stats.get('installs_last_month', 0)
-                time.sleep(1) # Add a delay to avoid overwhelming Flathub
-            except Exception as e:
-                logger.warning(f"Could not fetch monthly download count for {package.flatpak_id}: {e}")
-
-            packages.append(package)
+            package = packages_by_id.get(item['flatpak_id'])
+            if package is None:
+                package = OutdatedPackage(
+                    flatpak_id=item['flatpak_id'],
+                    sources=item['sources'],
+                    current_runtime=item['current_runtime'],
+                    latest_runtime=item['latest_runtime'],
+                    current_version=item['current_version'],
+                    latest_version=item['latest_version']
+                )
+                packages_by_id[package.flatpak_id] = package
+            package.arches.append(item.get('arch', 'x86_64'))
+        packages = list(packages_by_id.values())
+        
+        if stats:
+            fetch_download_stats(packages, stats)
         
         # Get all tracked packages for cleanup logic
         all_tracked_packages = data.get('all_tracked_packages', [])
+        unchecked_packages = data.get('unchecked_packages', [])
         
-        return packages, all_tracked_packages
+        return packages, all_tracked_packages, unchecked_packages
         
     except Exception as e:
         logger.error(f"Failed to load outdated packages from {file_path}: {e}")
-        return [], []
+        return [], [], []
 
 
 def group_packages_by_runtime(packages: List[OutdatedPackage]) -> Tuple[List[OutdatedPackage], List[OutdatedPackage], List[OutdatedPackage], List[OutdatedPackage]]:
@@ -419,20 +548,39 @@ def identify_popular_packages(packages_by_runtime: Dict[str, List[OutdatedPackag
 
 def main():
     """Main entry point for issue generation."""
-    if len(sys.argv) != 2:
-        logger.error("Usage: python issue_generator.py <outdated_packages.json>")
-        sys.exit(1)
+    import argparse
     
-    outdated_file = sys.argv[1]
+    parser = argparse.ArgumentParser(description='Create and update GitHub issues for outdated flatpak runtimes')
+    parser.add_argument('outdated_file', help='Output JSON of check_flatpak_runtimes.py')
+    snapshot_group = parser.add_mutually_exclusive_group()
+    snapshot_group.add_argument('--offline', metavar='DIR',
+                                help='Read every input from the snapshot in DIR and make no network calls; '
+                                     'issue changes are only logged')
+    snapshot_group.add_argument('--record-snapshot', metavar='DIR',
+                                help='Record every input of this run into DIR for --offline')
+    parser.add_argument('--stats-ttl', type=int, default=DEFAULT_STATS_TTL, metavar='SECONDS',
+                        help=f'Age after which stored download counts are refreshed in the background '
+                             f'(default: {DEFAULT_STATS_TTL})')
+    parser.add_argument('--bulk-stats', action='store_true',
+                        help="Read download counts from Flathub's ranked popular collection first and "
+                             "fetch per-app stats only for apps it does not cover")
+    parser.add_argument('--popular-file', metavar='FILE',
+                        help='Saved popular collection JSON to use instead of the endpoint (implies --bulk-stats)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Print the issue creates, edits, labels, comments and closes this run would make '
+                             'and exit without applying them')
+    args = parser.parse_args()
+    
+    outdated_file = args.outdated_file
     
     github_token = os.environ.get('GITHUB_TOKEN')
     repo_name = os.environ.get('GITHUB_REPOSITORY')
     
-    if not github_token:
+    if not github_token and not args.offline:
         logger.error("GITHUB_TOKEN environment variable is required")
         sys.exit(1)
         
-    if not repo_name:
+    if not repo_name and not args.offline:
         logger.error("GITHUB_REPOSITORY environment variable is required")
         sys.exit(1)
     
@@ -440,14 +588,41 @@ def main():
         logger.error(f"Outdated packages file not found: {outdated_file}")
         sys.exit(1)
     
-    # Load outdated packages and all tracked packages
-    packages, all_tracked_packages = load_outdated_packages(outdated_file)
+    # Load outdated packages and all tracked packages; download stats are fetched below
+    snapshot = None
+    if args.offline or args.record_snapshot:
+        # Stored stats would hide inputs from the snapshot
+        snapshot = Snapshot(args.offline or args.record_snapshot, record=bool(args.record_snapshot))
+        stats = DownloadStats(session=snapshot.session(create_stats_session()), ttl=args.stats_ttl,
+                              bulk=args.bulk_stats, popular_file=args.popular_file)
+    else:
+        stats = DownloadStats.open(ttl=args.stats_ttl, bulk=args.bulk_stats, popular_file=args.popular_file)
+    packages, all_tracked_packages, unchecked_packages = load_outdated_packages(outdated_file)
     if not packages and not all_tracked_packages:
         logger.info("No data found or failed to load file")
         sys.exit(0)
     
     logger.info(f"Found {len(packages)} outdated packages")
     logger.info(f"Tracking {len(all_tracked_packages)} total packages")
+    if unchecked_packages:
+        logger.info(f"{len(unchecked_packages)} packages were not checked before the deadline")
+    
+    # Initialize issue generator
+    if args.offline:
+        generator = IssueGenerator(None, None, repo=snapshot.repository())
+    else:
+        generator = IssueGenerator(github_token, repo_name)
+        if snapshot:
+            snapshot.record_repository(generator.repo)
+    
+    # Download stats are only needed for popularity, so they load while the open issues are listed
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        stats_loaded = executor.submit(fetch_download_stats, packages, stats)
+        try:
+            generator.open_issue_index()
+        except Exception as e:
+            logger.error(f"Failed to list open issues: {e}")
+        stats_loaded.result()
     
     # Group packages by runtime type
     gnome_packages, kde_packages, freedesktop_packages, other_packages = group_packages_by_runtime(packages)
@@ -466,21 +641,25 @@ def main():
     
     logger.info(f"Total popular packages: {len(popular_package_ids)}")
     
-    # Initialize issue generator
-    generator = IssueGenerator(github_token, repo_name)
-    
-    # Close resolved issues first - pass both lists
-    current_outdated_flatpak_ids = [pkg.flatpak_id for pkg in packages]
-    generator.close_resolved_issues(current_outdated_flatpak_ids, all_tracked_packages)
-    
-    # Create or update issues for outdated packages
-    created_or_updated_count = 0
-    for package in packages:
-        is_popular = package.flatpak_id in popular_package_ids
-        if generator.create_or_update_issue(package, is_popular):
-            created_or_updated_count += 1
+    # Compare the desired issues with the open ones; planning reads nothing beyond the index
+    try:
+        operations = generator.plan(packages, popular_package_ids, all_tracked_packages, unchecked_packages)
+    except Exception as e:
+        logger.error(f"Failed to plan issue changes: {e}")
+        sys.exit(1)
     
-    logger.info(f"Created or updated {created_or_updated_count} issues for outdated packages")
+    if args.plan:
+        print(format_plan(operations))
+    elif operations:
+        applied = generator.apply(operations)
+        logger.info(f"Applied {sum(applied.values())} of {len(operations)} planned issue changes: "
+                    f"{', '.join(f'{count} {action}' for action, count in applied.items())}")
+    else:
+        logger.info("All issues are already up to date; nothing to write")
+    stats.wait()
+    stats.log_summary()
+    if snapshot:
+        snapshot.log_summary()
 
 
 if __name__ == '__main__':
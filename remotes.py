@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Flatpak remotes the runtime checker resolves app runtimes from.
+Each remote has its own connection pool, concurrency limit and cache namespace,
+so a slow remote only holds back the apps that come from it.
+"""
+
+import logging
+import subprocess
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import yaml
+
+from appstream import slim_appstream
+from http_cache import ResponseCache, DEFAULT_TTL
+from http_client import RetryingSession, create_session
+from snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+# Remote used for apps without an explicit assignment
+DEFAULT_REMOTE = 'flathub'
+
+# Remotes known without configuration; flathub-beta has no appstream API and is read from its listing
+BUILTIN_REMOTES = {
+    'flathub': {'api_url': 'https://flathub.org/api/v2/appstream'},
+    'flathub-beta': {}
+}
+
+# Concurrent requests per configured remote unless its config says otherwise
+DEFAULT_REMOTE_WORKERS = 4
+
+# Timeout for one "flatpak remote-ls" listing
+LISTING_TIMEOUT = 300
+
+
+class RemoteBackend:
+    """One flatpak remote: appstream lookups over its own session and cache, plus remote listings."""
+
+    def __init__(self, name: str, api_url: Optional[str] = None, workers: int = DEFAULT_REMOTE_WORKERS,
+                 cache: Optional[ResponseCache] = None, session: Optional[RetryingSession] = None,
+                 runner: Callable[..., subprocess.CompletedProcess] = subprocess.run):
+        self.name = name
+        self.api_url = api_url.rstrip('/') if api_url else None
+        self.workers = max(1, workers)
+        self.cache = cache
+        host = urlsplit(self.api_url).hostname if self.api_url else None
+        self.session = session or create_session(pool_maxsize=self.workers, max_concurrency=self.workers,
+                                                 concurrency_hosts=(host,) if host else ())
+        self.runner = runner
+
+    def appstream_url(self, app_id: str) -> Optional[str]:
+        """Appstream API URL of an app, or None for remotes that are only listed."""
+        return f"{self.api_url}/{app_id}" if self.api_url else None
+
+    def get(self, url: str, timeout: float):
+        """GET an appstream URL through this remote's response cache when one is configured."""
+        if self.cache:
+            return self.cache.get(self.session, url, timeout=timeout, transform=slim_appstream)
+        return self.session.get(url, timeout=timeout)
+
+    def list_apps(self, arch: str) -> Optional[str]:
+        """Output of ``flatpak remote-ls --columns=ref,runtime`` for one arch, or None on failure."""
+        cmd = ['flatpak', 'remote-ls', f'--arch={arch}', '--columns=ref,runtime', self.name]
+        try:
+            result = self.runner(cmd, capture_output=True, text=True, timeout=LISTING_TIMEOUT)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Could not list {self.name} for {arch} runtime resolution: {e}")
+            return None
+        if result.returncode != 0:
+            logger.warning(f"Could not list {self.name} for {arch} runtime resolution: {result.stderr.strip()}")
+            return None
+        return result.stdout
+
+    def log_summary(self):
+        """Log cache and HTTP statistics for this remote."""
+        if self.cache:
+            self.cache.log_summary()
+        if self.api_url:
+            self.session.log_summary()
+
+
+def load_remotes(config_file: str, cache_dir: Optional[str] = None,
+                 cache_ttl: int = DEFAULT_TTL,
+                 snapshot: Optional[Snapshot] = None) -> Tuple[Dict[str, RemoteBackend], Dict[str, str]]:
+    """Read a remotes config file.
+
+    The file maps remote names to their settings and app IDs to the remote they
+    come from::
+
+        remotes:
+          flathub-beta: {}
+          example:
+            api_url: https://flatpak.example.org/api/v2/appstream
+            workers: 2
+        apps:
+          org.example.App: flathub-beta
+
+    Returns the backends of every remote other than flathub, whose backend is
+    owned by the checker, and the app ID -> remote assignments. With a
+    snapshot, every backend records into or replays from it.
+    Raises ValueError for an unreadable file or an app assigned to an unknown remote.
+    """
+    try:
+        with open(config_file, 'r') as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        raise ValueError(f"could not read remotes config {config_file}: {e}")
+    if not isinstance(config, dict):
+        raise ValueError(f"remotes config {config_file} is not a mapping")
+
+    settings = {name: dict(value) for name, value in BUILTIN_REMOTES.items()}
+    for name, value in (config.get('remotes') or {}).items():
+        settings.setdefault(name, {}).update(value or {})
+
+    apps = {}
+    for app_id, remote in (config.get('apps') or {}).items():
+        if remote not in settings:
+            raise ValueError(f"{app_id} is assigned to unknown remote {remote}")
+        apps[app_id.replace('app/', '')] = remote
+
+    backends = {}
+    for name, value in settings.items():
+        if name == DEFAULT_REMOTE:
+            continue
+        cache = None
+        if cache_dir and value.get('api_url'):
+            cache = ResponseCache(cache_dir, namespace=f"remote-{name}", ttl=cache_ttl)
+        backend = RemoteBackend(name, api_url=value.get('api_url'),
+                                workers=int(value.get('workers', DEFAULT_REMOTE_WORKERS)), cache=cache)
+        if snapshot:
+            backend.session = snapshot.session(backend.session)
+            backend.runner = snapshot.run
+        backends[name] = backend
+    return backends, apps
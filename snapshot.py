@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Stored snapshots of every input the tracker reads, for offline replay.
+A snapshot directory holds HTTP responses keyed by URL, "flatpak remote-ls"
+output and a copy of the GitHub repository's issues and workflow runs. Runs
+with --record-snapshot write one; runs with --offline read it and make no
+network calls.
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept in a snapshot
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+# Latest completed scheduled runs kept of a recorded workflow
+RECORDED_WORKFLOW_RUNS = 10
+
+
+def _key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class Snapshot:
+    """A snapshot directory, either being recorded or replayed."""
+
+    def __init__(self, directory: str, record: bool = False):
+        self.directory = directory
+        self.record = record
+        self.replayed = 0
+        self.missing: List[str] = []
+        self._lock = threading.Lock()
+        self.manifest = {}
+        if record:
+            os.makedirs(directory, exist_ok=True)
+            self.manifest = {'recorded_at': datetime.now().isoformat()}
+            self._write('snapshot.json', self.manifest)
+        else:
+            self.manifest = self._read('snapshot.json') or {}
+            if not self.manifest:
+                logger.warning(f"{directory} has no snapshot.json; is it a recorded snapshot?")
+
+    @property
+    def recorded_at(self) -> Optional[datetime]:
+        return _parse_time(self.manifest.get('recorded_at'))
+
+    def _read(self, name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, name), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name: str, document: Dict):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+
+    def _miss(self, what: str):
+        with self._lock:
+            self.missing.append(what)
+        logger.debug(f"Not in snapshot {self.directory}: {what}")
+
+    # HTTP
+
+    def session(self, session: requests.Session) -> requests.Session:
+        """The session a script should use: the replaying stand-in, or ``session`` recording into the snapshot."""
+        if not self.record:
+            return SnapshotSession(self)
+        request = session.request
+
+        def recording_request(method, url, *args, **kwargs):
+            response = request(method, url, *args, **kwargs)
+            self.store_response(method, url, response)
+            return response
+
+        session.request = recording_request
+        return session
+
+    def store_response(self, method: str, url: str, response: requests.Response):
+        entry = {
+            'method': method.upper(),
+            'url': url,
+            'status_code': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+        }
+        try:
+            entry['body'] = response.content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_base64'] = base64.b64encode(response.content).decode('ascii')
+        self._write(os.path.join('http', f"{_key(f'{method.upper()} {url}')}.json"), entry)
+
+    def load_response(self, method: str, url: str) -> Optional[requests.Response]:
+        entry = self._read(os.path.join('http', f"{_key(f'{method.upper()} {url}')}.json"))
+        if entry is None:
+            self._miss(f"{method.upper()} {url}")
+            return None
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.url = url
+        response.encoding = 'utf-8'
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        if 'body_base64' in entry:
+            response._content = base64.b64decode(entry['body_base64'])
+        else:
+            response._content = entry.get('body', '').encode('utf-8')
+        with self._lock:
+            self.replayed += 1
+        return response
+
+    # flatpak remote-ls
+
+    def run(self, cmd: List[str], **kwargs) -> subprocess.CompletedProcess:
+        """``subprocess.run`` replacement: records or replays a command's output."""
+        name = os.path.join('commands', f"{_key(' '.join(cmd))}.json")
+        if self.record:
+            result = subprocess.run(cmd, **kwargs)
+            self._write(name, {'cmd': cmd, 'returncode': result.returncode,
+                               'stdout': result.stdout, 'stderr': result.stderr})
+            return result
+        entry = self._read(name)
+        if entry is None:
+            self._miss(' '.join(cmd))
+            return subprocess.CompletedProcess(cmd, 1, '', 'not in snapshot')
+        with self._lock:
+            self.replayed += 1
+        return subprocess.CompletedProcess(cmd, entry['returncode'], entry['stdout'], entry['stderr'])
+
+    # GitHub
+
+    def record_repository(self, repo, closed_since: Optional[datetime] = None, workflow_name: Optional[str] = None):
+        """Copy a PyGithub repository's open issues, and optionally recently closed issues and workflow runs.
+
+        Only the workflows whose name contains ``workflow_name`` are recorded,
+        with their latest ``RECORDED_WORKFLOW_RUNS`` completed scheduled runs.
+        Recordings of several scripts into one snapshot are merged: issues are
+        combined by number, and workflows recorded earlier are kept.
+        """
+        def issue_entry(issue) -> Dict:
+            return {
+                'number': issue.number,
+                'title': issue.title,
+                'body': issue.body,
+                'state': issue.state,
+                'labels': [label.name for label in issue.labels],
+                'created_at': _format_time(issue.created_at),
+                'updated_at': _format_time(issue.updated_at),
+                'closed_at': _format_time(issue.closed_at)
+            }
+
+        document = {'full_name': repo.full_name, 'issues': [issue_entry(issue) for issue in repo.get_issues(state='open')]}
+        if closed_since:
+            document['issues'] += [issue_entry(issue) for issue in repo.get_issues(state='closed', since=closed_since)]
+        if workflow_name:
+            document['workflows'] = [{
+                'id': workflow.id,
+                'name': workflow.name,
+                'runs': [{'id': run.id, 'created_at': _format_time(run.created_at), 'event': run.event,
+                          'status': run.status, 'conclusion': run.conclusion}
+                         for run in itertools.islice(workflow.get_runs(status='completed', event='schedule'),
+                                                     RECORDED_WORKFLOW_RUNS)]
+            } for workflow in repo.get_workflows() if workflow_name in workflow.name]
+        existing = self._read('github.json') or {}
+        if existing.get('full_name') == repo.full_name:
+            issues = {issue['number']: issue for issue in existing.get('issues', [])}
+            issues.update((issue['number'], issue) for issue in document['issues'])
+            document['issues'] = sorted(issues.values(), key=lambda issue: issue['number'])
+            if 'workflows' in existing and 'workflows' not in document:
+                document['workflows'] = existing['workflows']
+        self._write('github.json', document)
+        logger.info(f"Recorded {len(document['issues'])} issues of {repo.full_name} into {self.directory}")
+
+    def repository(self) -> 'SnapshotRepository':
+        """Stand-in for the PyGithub repository, read from the snapshot."""
+        document = self._read('github.json')
+        if document is None:
+            self._miss('github.json')
+            document = {}
+        return SnapshotRepository(document)
+
+    def log_summary(self):
+        logger.info(f"Snapshot {self.directory}: {'recorded' if self.record else f'{self.replayed} responses replayed'}"
+                    f"{f', {len(self.missing)} missing' if self.missing else ''}")
+
+
+class SnapshotSession(requests.Session):
+    """Session that answers every request from a snapshot and never touches the network."""
+
+    def __init__(self, snapshot: Snapshot):
+        super().__init__()
+        self.snapshot = snapshot
+
+    def request(self, method, url, *args, **kwargs):
+        response = self.snapshot.load_response(method, url)
+        if response is None:
+            raise requests.ConnectionError(f"{url} is not in the snapshot")
+        return response
+
+    def log_summary(self):
+        """Replayed requests are summarised by the snapshot itself."""
+
+
+class SnapshotLabel:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class SnapshotIssue:
+    """Recorded issue; writes are logged and applied in memory only."""
+
+    def __init__(self, entry: Dict):
+        self.number = entry['number']
+        self.title = entry['title']
+        self.body = entry.get('body')
+        self.state = entry.get('state', 'open')
+        self.labels = [SnapshotLabel(name) for name in entry.get('labels', [])]
+        self.created_at = _parse_time(entry.get('created_at'))
+        self.updated_at = _parse_time(entry.get('updated_at'))
+        self.closed_at = _parse_time(entry.get('closed_at'))
+
+    def edit(self, title: Optional[str] = None, body: Optional[str] = None, state: Optional[str] = None, **kwargs):
+        logger.info(f"Offline: would edit issue #{self.number}"
+                    f"{f' (state: {state})' if state else ''}")
+        self.title = title or self.title
+        self.body = body if body is not None else self.body
+        self.state = state or self.state
+
+    def create_comment(self, body: str):
+        logger.info(f"Offline: would comment on issue #{self.number}")
+
+    def add_to_labels(self, *labels):
+        logger.info(f"Offline: would label issue #{self.number} with {', '.join(str(label) for label in labels)}")
+        self.labels += [SnapshotLabel(str(label)) for label in labels]
+
+
+class SnapshotWorkflowRun:
+    def __init__(self, entry: Dict):
+        self.id = entry['id']
+        self.created_at = _parse_time(entry.get('created_at'))
+        self.event = entry.get('event')
+        self.status = entry.get('status')
+        self.conclusion = entry.get('conclusion')
+
+
+class SnapshotWorkflow:
+    def __init__(self, entry: Dict):
+        self.id = entry['id']
+        self.name = entry['name']
+        self._runs = [SnapshotWorkflowRun(run) for run in entry.get('runs', [])]
+
+    def get_runs(self, status: Optional[str] = None, event: Optional[str] = None) -> List[SnapshotWorkflowRun]:
+        return [run for run in self._runs
+                if (status is None or run.status == status) and (event is None or run.event == event)]
+
+
+class SnapshotRepository:
+    """The parts of PyGithub's Repository the tracker uses, backed by a snapshot."""
+
+    def __init__(self, document: Dict):
+        self.full_name = document.get('full_name', '')
+        self._issues = [SnapshotIssue(entry) for entry in document.get('issues', [])]
+        self._workflows = [SnapshotWorkflow(entry) for entry in document.get('workflows', [])]
+
+    def get_issues(self, state: str = 'open', labels: Optional[List[str]] = None,
+                   since: Optional[datetime] = None) -> List[SnapshotIssue]:
+        issues = []
+        for issue in self._issues:
+            if state != 'all' and issue.state != state:
+                continue
+            if labels and not set(str(label) for label in labels) <= set(label.name for label in issue.labels):
+                continue
+            if since and (issue.updated_at or issue.closed_at or since) < since:
+                continue
+            issues.append(issue)
+        return issues
+
+    def create_issue(self, title: str, body: str = '', labels: Optional[List[str]] = None) -> SnapshotIssue:
+        number = max((issue.number for issue in self._issues), default=0) + 1
+        issue = SnapshotIssue({'number': number, 'title': title, 'body': body, 'labels': list(labels or []),
+                               'created_at': datetime.now().isoformat()})
+        self._issues.append(issue)
+        logger.info(f"Offline: would create issue #{number}: {title}")
+        return issue
+
+    def get_workflows(self) -> List[SnapshotWorkflow]:
+        return self._workflows
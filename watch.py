@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Long-running watch mode for the runtime checker.
+Re-runs the check on a schedule, keeping results in memory, and serves them
+over a small local HTTP/JSON endpoint.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks
+DEFAULT_INTERVAL = 15 * 60
+
+# Address the query endpoint listens on; loopback only unless configured otherwise
+DEFAULT_LISTEN = '127.0.0.1:8790'
+
+
+def parse_listen(value: str) -> Tuple[str, int]:
+    """Parse a HOST:PORT listen address (":PORT" listens on all interfaces)."""
+    host, _, port = value.rpartition(':')
+    if not port.isdigit():
+        raise ValueError(f"invalid listen address '{value}', expected HOST:PORT")
+    return host, int(port)
+
+
+class WatchService:
+    """Runs ``check_runtime_updates`` every ``interval`` seconds and answers queries about the last run.
+
+    Sources and appstream documents go through the checker's response caches,
+    so each cycle only downloads what changed upstream, and unchanged apps
+    reuse their previous verdicts.
+    """
+
+    def __init__(self, checker, interval: float = DEFAULT_INTERVAL):
+        self.checker = checker
+        self.interval = interval
+        self.runs = 0
+        self.running = False
+        self.last_started: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run: Optional[float] = None
+        self._stop = threading.Event()
+
+    def run_once(self):
+        """Run one check; a failed run is logged and keeps the previous results."""
+        self.running = True
+        self.last_started = time.time()
+        try:
+            self.checker.check_runtime_updates()
+            self.last_error = None
+        except Exception as e:
+            logger.exception(f"Watch run failed: {e}")
+            self.last_error = str(e)
+        finally:
+            self.runs += 1
+            self.running = False
+            self.last_duration = time.time() - self.last_started
+
+    def run_forever(self):
+        """Check, then sleep until the next cycle, until ``stop`` is called."""
+        while not self._stop.is_set():
+            self.run_once()
+            self.next_run = time.time() + self.interval
+            logger.info(f"Next check in {self.interval:.0f}s")
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> Dict:
+        """Summary of the service and the last completed run."""
+        results = self.checker.results
+
+        def timestamp(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value).isoformat() if value else None
+
+        return {
+            'runs': self.runs,
+            'running': self.running,
+            'last_started': timestamp(self.last_started),
+            'last_duration': round(self.last_duration, 1) if self.last_duration is not None else None,
+            'last_error': self.last_error,
+            'next_run': timestamp(self.next_run),
+            'results_timestamp': results.get('timestamp'),
+            'total_checked': results.get('total_checked', 0),
+            'outdated_count': len({package['flatpak_id'] for package in results.get('outdated_packages', [])}),
+            'tracked_count': len(results.get('apps', {}))
+        }
+
+    def query(self, path: str) -> Tuple[int, Dict]:
+        """Answer a GET request path with a status code and a JSON document."""
+        results = self.checker.results
+        parts = [unquote(part) for part in urlsplit(path).path.split('/') if part]
+
+        if parts in ([], ['status']):
+            return 200, self.status()
+        if parts == ['outdated']:
+            packages = results.get('outdated_packages', [])
+            return 200, {'timestamp': results.get('timestamp'),
+                         'outdated_count': len({package['flatpak_id'] for package in packages}),
+                         'outdated_packages': packages}
+        if parts == ['apps']:
+            apps = results.get('apps', {})
+            return 200, {'timestamp': results.get('timestamp'),
+                         'apps': {fid: app['status'] for fid, app in apps.items()}}
+        if len(parts) >= 2 and parts[0] == 'apps':
+            # Accept both "apps/org.example.App" and "apps/app/org.example.App"
+            app_id = '/'.join(parts[1:])
+            flatpak_id = app_id if app_id.startswith('app/') else f"app/{app_id}"
+            app = results.get('apps', {}).get(flatpak_id)
+            if app is None:
+                return 404, {'error': f"{app_id} is not tracked"}
+            return 200, dict(app, flatpak_id=flatpak_id, timestamp=results.get('timestamp'))
+        return 404, {'error': 'not found', 'endpoints': ['/status', '/outdated', '/apps', '/apps/<app-id>']}
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    """Serves WatchService.query as JSON; the service is attached to the server."""
+
+    def do_GET(self):
+        code, document = self.server.service.query(self.path)
+        body = json.dumps(document, indent=2).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def serve(service: WatchService, listen: str = DEFAULT_LISTEN) -> ThreadingHTTPServer:
+    """Start the query endpoint on a background thread and return the server."""
+    host, port = parse_listen(listen)
+    server = ThreadingHTTPServer((host, port), _QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, name='watch-endpoint', daemon=True).start()
+    logger.info(f"Serving check results on http://{host or '0.0.0.0'}:{server.server_address[1]}/")
+    return server
+
+
+def run_watch(checker, interval: float = DEFAULT_INTERVAL, listen: str = DEFAULT_LISTEN):
+    """Run the checker in watch mode until interrupted."""
+    service = WatchService(checker, interval)
+    server = serve(service, listen)
+    try:
+        service.run_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping watch mode")
+    finally:
+        service.stop()
+        server.shutdown()